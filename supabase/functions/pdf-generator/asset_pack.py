@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Construction du pack d'assets - MayFin
+Prépare au déploiement les images statiques (logo MayFin, logos de franchise,
+visuels récurrents) à leur résolution d'affichage et les regroupe dans un
+fichier unique, projeté en mémoire et partagé par les workers de rendu
+
+Usage :
+    python asset_pack.py --output mayfin_assets.pack --logo franchises/ --document modeles/
+    MAYFIN_ASSET_PACK=mayfin_assets.pack python generate_mayfin_report.py dossiers.ndjson.gz rapports/
+"""
+
+import argparse
+import json
+import os
+
+from generate_mayfin_report import DEFAULT_LOGO_PATH, LOGO_BOX, THUMBNAIL_BOX
+from image_pipeline import DEFAULT_DPI, PACK_HEADER, PACK_MAGIC, PACK_VERSION, ImagePipeline, pack_align
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def _expand(paths):
+    """Fichiers images d'une liste de chemins (les répertoires sont parcourus)"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def build_asset_pack(output_path, entries, dpi=DEFAULT_DPI):
+    """
+    Écrit un pack d'assets à partir d'entrées (source, largeur, hauteur) en
+    points et retourne le nombre d'images retenues. Le fichier est remplacé
+    de façon atomique : les workers ayant projeté l'ancien pack le conservent.
+    """
+    pipeline = ImagePipeline(dpi=dpi)
+    images = {}
+    for source, width, height in entries:
+        prepared = pipeline.get(source, width, height)
+        if prepared is not None:
+            images[prepared.key] = prepared
+
+    # Positions relatives à la zone de données, alignée, qui suit l'index
+    index = []
+    offset = 0
+    for key, prepared in images.items():
+        index.append({
+            'digest': key[0],
+            'box': list(key[1]),
+            'size': list(prepared.pixel_size),
+            'jpeg': prepared.is_jpeg,
+            'offset': offset,
+            'length': len(prepared.data),
+        })
+        offset = pack_align(offset + len(prepared.data))
+    index_bytes = json.dumps({'dpi': dpi, 'images': index}).encode('utf-8')
+    data_start = pack_align(PACK_HEADER.size + len(index_bytes))
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        for entry, prepared in zip(index, images.values()):
+            f.write(b'\0' * (data_start + entry['offset'] - f.tell()))
+            f.write(prepared.data)
+    os.replace(tmp_path, output_path)
+    return len(index)
+
+
+def main():
+    """Point d'entrée CLI"""
+    parser = argparse.ArgumentParser(description="Construction du pack d'assets partagé MayFin")
+    parser.add_argument('--output', default='mayfin_assets.pack', help="fichier du pack")
+    parser.add_argument('--logo', action='append', default=[],
+                        help="logo d'en-tête (fichier ou répertoire), répétable ; le logo MayFin est toujours inclus")
+    parser.add_argument('--document', action='append', default=[],
+                        help="aperçu de document récurrent (fichier ou répertoire), répétable")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    args = parser.parse_args()
+
+    entries = [(path, *LOGO_BOX) for path in _expand([DEFAULT_LOGO_PATH] + args.logo)]
+    entries += [(path, *THUMBNAIL_BOX) for path in _expand(args.document)]
+    count = build_asset_pack(args.output, entries, args.dpi)
+    print(f"📦 {count} image(s) dans {args.output} ({os.path.getsize(args.output)} octets)")
+
+
+if __name__ == "__main__":
+    main()
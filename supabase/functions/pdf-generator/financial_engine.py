@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de calcul du financement - MayFin
+Mensualités, tableaux d'amortissement, DSCR et ratios calculés
+de façon vectorisée sur un portefeuille complet de dossiers
+"""
+
+import numpy as np
+
+# Années des comptes prévisionnels, dans l'ordre
+ANNEES = ('annee1', 'annee2', 'annee3')
+
+# Champs numériques lus dans chaque année de prévisionnel
+CHAMPS_PREVISIONNELS = ('ca', 'charges_var', 'marge', 'charges_fixes', 'ebitda', 'rex', 'rnet')
+
+# Durée de prêt maximale acceptée (mois) : au-delà, la saisie est tenue pour invalide
+DUREE_MAX_MOIS = 600
+
+
+def to_float(value):
+    """Convertit une valeur saisie ("105 507 €", "23,7 %", 1.51...) en float, NaN si impossible"""
+    if value is None or value == "-":
+        return np.nan
+    try:
+        if isinstance(value, str):
+            value = (value.replace(" ", "").replace("\u00A0", "").replace("€", "")
+                     .replace("%", "").replace(",", "."))
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _duree_valide(value):
+    """Durée de prêt en mois, NaN si elle est non finie, négative, nulle ou hors bornes"""
+    duree = to_float(value)
+    if not np.isfinite(duree) or duree <= 0 or duree > DUREE_MAX_MOIS:
+        return np.nan
+    return duree
+
+
+def _safe_divide(numerator, denominator):
+    """Division élément par élément renvoyant NaN quand le dénominateur est nul"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    return np.where(denominator == 0, np.nan, result)
+
+
+def _block(data, key):
+    """Sous-dictionnaire d'un dossier, vide s'il est absent ou mal formé"""
+    value = data.get(key) if isinstance(data, dict) else None
+    return value if isinstance(value, dict) else {}
+
+
+def extract_inputs(dossiers):
+    """Extrait les entrées numériques d'une liste de dossiers sous forme de tableaux"""
+    n = len(dossiers)
+    inputs = {
+        'emprunt': np.empty(n),
+        'apport': np.empty(n),
+        'total_besoins': np.empty(n),
+        'total_ressources': np.empty(n),
+        'taux_interet': np.empty(n),
+        'duree_mois': np.empty(n),
+    }
+    for champ in CHAMPS_PREVISIONNELS:
+        inputs[champ] = np.empty((n, len(ANNEES)))
+
+    for i, data in enumerate(dossiers):
+        financement = _block(data, 'financement')
+        previsionnels = _block(data, 'previsionnels')
+        data = data if isinstance(data, dict) else {}
+        inputs['emprunt'][i] = to_float(financement.get('emprunt', data.get('montant_finance')))
+        inputs['apport'][i] = to_float(financement.get('apport', data.get('apport_client')))
+        inputs['total_besoins'][i] = to_float(financement.get('total_besoins'))
+        inputs['total_ressources'][i] = to_float(financement.get('total_ressources'))
+        inputs['taux_interet'][i] = to_float(data.get('taux_interet'))
+        inputs['duree_mois'][i] = _duree_valide(data.get('duree_mois'))
+        for j, annee in enumerate(ANNEES):
+            valeurs = _block(previsionnels, annee)
+            for champ in CHAMPS_PREVISIONNELS:
+                inputs[champ][i, j] = to_float(valeurs.get(champ))
+
+    return inputs
+
+
+def compute_mensualite(capital, taux_annuel, duree_mois):
+    """Mensualité constante d'un prêt amortissable (taux annuel en %)"""
+    taux = np.asarray(taux_annuel, dtype=float) / 100 / 12
+    duree = np.asarray(duree_mois, dtype=float)
+    capital = np.asarray(capital, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        annuite = capital * taux / (1 - (1 + taux) ** -duree)
+        lineaire = capital / duree
+    mensualite = np.where(taux == 0, lineaire, annuite)
+    return np.where(duree > 0, mensualite, np.nan)
+
+
+def compute_schedule(capital, taux_annuel, duree_mois):
+    """
+    Tableaux d'amortissement mensuels de N prêts, de forme (N, M) avec M la
+    durée maximale. Les mois au-delà de la durée de chaque prêt valent 0.
+    """
+    capital = np.asarray(capital, dtype=float)
+    taux = np.asarray(taux_annuel, dtype=float)[:, None] / 100 / 12
+    duree = np.asarray(duree_mois, dtype=float)
+    mensualite = compute_mensualite(capital, taux_annuel, duree)
+
+    valid = np.isfinite(mensualite) & np.isfinite(capital)
+    nb_mois = int(np.nanmax(np.where(valid, duree, 0), initial=0))
+    mois = np.arange(1, nb_mois + 1)[None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        croissance = (1 + taux) ** mois
+        restant = np.where(
+            taux == 0,
+            capital[:, None] - mensualite[:, None] * mois,
+            capital[:, None] * croissance - mensualite[:, None] * (croissance - 1) / taux,
+        )
+    actif = (mois <= duree[:, None]) & valid[:, None]
+    restant = np.where(actif, np.maximum(restant, 0), 0)
+
+    restant_debut = np.concatenate([capital[:, None], restant], axis=1)[:, :nb_mois]
+    interets = np.where(actif, restant_debut * taux, 0)
+    amortissement = np.where(actif, mensualite[:, None] - interets, 0)
+
+    return {
+        'mensualite': mensualite,
+        'interets': interets,
+        'capital': amortissement,
+        'restant_du': restant,
+        'actif': actif,
+    }
+
+
+def aggregate_by_year(monthly, nb_annees):
+    """Agrège des montants mensuels (N, M) en montants annuels (N, nb_annees)"""
+    n, nb_mois = monthly.shape
+    padded = np.zeros((n, nb_annees * 12))
+    largeur = min(nb_mois, nb_annees * 12)
+    padded[:, :largeur] = monthly[:, :largeur]
+    return padded.reshape(n, nb_annees, 12).sum(axis=2)
+
+
+class FinancingResults:
+    """Résultats du moteur de financement pour un portefeuille de dossiers"""
+
+    def __init__(self, inputs, schedule):
+        self.inputs = inputs
+        self.schedule = schedule
+        self.mensualite = schedule['mensualite']
+
+        nb_mois = schedule['interets'].shape[1]
+        nb_annees = max(len(ANNEES), -(-nb_mois // 12))
+        self.interets_annuels = aggregate_by_year(schedule['interets'], nb_annees)
+        self.capital_annuel = aggregate_by_year(schedule['capital'], nb_annees)
+        self.annuites = self.interets_annuels + self.capital_annuel
+        fin_annee = np.arange(1, nb_annees + 1) * 12
+        restant_padded = np.zeros((len(self.mensualite), nb_annees * 12))
+        restant_padded[:, :nb_mois] = schedule['restant_du']
+        self.restant_annuel = restant_padded[:, fin_annee - 1]
+
+        # Les ratios sont exprimés en % comme dans le bloc 'ratios' du JSON d'entrée
+        self.dscr = _safe_divide(inputs['ebitda'], self.annuites[:, :len(ANNEES)])
+        self.taux_endettement = _safe_divide(inputs['emprunt'], inputs['total_ressources']) * 100
+        self.taux_apport = _safe_divide(inputs['apport'], inputs['emprunt']) * 100
+        self.ratio_fonds_propres = _safe_divide(inputs['apport'], inputs['total_besoins']) * 100
+        self.marge_brute = _safe_divide(inputs['marge'], inputs['ca']) * 100
+        # Capacité de remboursement mensuelle : CAF (résultat net + dotations) / 12
+        caf = inputs['rnet'] + (inputs['ebitda'] - inputs['rex'])
+        self.capacite_remb = caf / 12
+
+    def __len__(self):
+        return len(self.mensualite)
+
+    def dossier(self, index):
+        """Résultats d'un dossier sous forme de dictionnaire prêt pour le rapport"""
+        actif = self.schedule['actif'][index]
+        nb_annees = -(-int(actif.sum()) // 12)
+        return {
+            'mensualite': float(self.mensualite[index]),
+            'taux_endettement': float(self.taux_endettement[index]),
+            'taux_apport': float(self.taux_apport[index]),
+            'ratio_fonds_propres': float(self.ratio_fonds_propres[index]),
+            'capacite_remb': float(self.capacite_remb[index, 0]),
+            'marge_brute': float(self.marge_brute[index, 0]),
+            'dscr': [float(v) for v in self.dscr[index]],
+            'echeancier_annuel': [
+                {
+                    'annee': annee + 1,
+                    'annuite': float(self.annuites[index, annee]),
+                    'interets': float(self.interets_annuels[index, annee]),
+                    'capital': float(self.capital_annuel[index, annee]),
+                    'restant_du': float(self.restant_annuel[index, annee]),
+                }
+                for annee in range(nb_annees)
+            ],
+        }
+
+
+def compute_financing(dossiers):
+    """Calcule en lot les indicateurs de financement d'une liste de dossiers"""
+    inputs = extract_inputs(dossiers)
+    schedule = compute_schedule(inputs['emprunt'], inputs['taux_interet'], inputs['duree_mois'])
+    return FinancingResults(inputs, schedule)
+
+
+# Entrées nécessaires au stress-test de l'année 1
+STRESS_TEST_CHAMPS = ('emprunt', 'taux_interet', 'duree_mois', 'ca', 'charges_var', 'ebitda', 'rnet')
+
+# Chocs par défaut de la grille de stress-test
+CHOCS_CA = np.arange(-0.30, 0.1001, 0.05)
+CHOCS_CHARGES_VAR = np.arange(-0.05, 0.0501, 0.025)
+CHOCS_TAUX = np.arange(0.0, 2.001, 0.25)
+CHOCS_DUREE = np.array([-24, -12, 0, 12, 24])
+
+
+def _restant_du(capital, taux_mensuel, mensualite, mois):
+    """Capital restant dû après `mois` échéances (formule fermée, diffusable)"""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        croissance = (1 + taux_mensuel) ** mois
+        restant = np.where(
+            taux_mensuel == 0,
+            capital - mensualite * mois,
+            capital * croissance - mensualite * (croissance - 1) / taux_mensuel,
+        )
+    return np.maximum(restant, 0)
+
+
+def annual_debt_service(capital, taux_annuel, duree_mois, nb_annees=len(ANNEES)):
+    """
+    Annuités et intérêts annuels d'un prêt sans construire l'échéancier mensuel.
+    Les entrées sont diffusées entre elles ; les sorties ont un axe final de
+    longueur `nb_annees`.
+    """
+    capital = np.asarray(capital, dtype=float)[..., None]
+    taux = np.asarray(taux_annuel, dtype=float)[..., None] / 100 / 12
+    duree = np.asarray(duree_mois, dtype=float)[..., None]
+    mensualite = compute_mensualite(capital, taux * 12 * 100, duree)
+
+    debut = np.minimum(np.arange(nb_annees) * 12, duree)
+    fin = np.minimum(np.arange(1, nb_annees + 1) * 12, duree)
+    annuite = mensualite * (fin - debut)
+    capital_rembourse = (_restant_du(capital, taux, mensualite, debut)
+                         - _restant_du(capital, taux, mensualite, fin))
+    return annuite, annuite - capital_rembourse
+
+
+class StressGrid:
+    """Résultats d'une grille de stress-test, axes (CA, charges var., taux, durée, année)"""
+
+    def __init__(self, chocs_ca, chocs_charges_var, chocs_taux, durees, dscr, rnet, duree=np.nan, missing=()):
+        self.chocs_ca = chocs_ca
+        self.chocs_charges_var = chocs_charges_var
+        self.chocs_taux = chocs_taux
+        self.durees = durees
+        # Durée du prêt sans choc (mois)
+        self.duree = duree
+        self.dscr = dscr
+        self.rnet = rnet
+        # Entrées de l'année 1 absentes ou invalides (noms des champs)
+        self.missing = list(missing)
+
+    @property
+    def size(self):
+        """Nombre de scénarios évalués"""
+        return self.dscr[..., 0].size
+
+    def index_of(self, axis_values, value):
+        """Indice de la valeur la plus proche sur un axe de chocs"""
+        return int(np.argmin(np.abs(np.asarray(axis_values) - value)))
+
+    def share_above(self, seuil, annee=0):
+        """Part des scénarios dont le DSCR atteint le seuil"""
+        dscr = self.dscr[..., annee]
+        return float(np.mean(np.nan_to_num(dscr, nan=-np.inf) >= seuil))
+
+
+def compute_stress_grid(data, chocs_ca=CHOCS_CA, chocs_charges_var=CHOCS_CHARGES_VAR,
+                        chocs_taux=CHOCS_TAUX, chocs_duree=CHOCS_DUREE):
+    """
+    Évalue en une passe vectorisée le DSCR et le résultat net d'un dossier
+    sur toutes les combinaisons de chocs :
+    - chocs_ca : variation relative du chiffre d'affaires (-0.2 = -20 %)
+    - chocs_charges_var : variation en points du ratio charges variables / CA
+    - chocs_taux : variation en points du taux d'intérêt annuel
+    - chocs_duree : variation en mois de la durée du prêt
+    Les charges fixes et les autres éléments du compte de résultat sont
+    conservés ; l'impact sur le résultat net est calculé avant impôt.
+    """
+    inputs = extract_inputs([data])
+    ca = inputs['ca'][0]
+    charges_var = inputs['charges_var'][0]
+    ebitda = inputs['ebitda'][0]
+    rnet = inputs['rnet'][0]
+    emprunt = inputs['emprunt'][0]
+    taux = inputs['taux_interet'][0]
+    duree = inputs['duree_mois'][0]
+    missing = [champ for champ in STRESS_TEST_CHAMPS if not np.isfinite(np.ravel(inputs[champ][0])[0])]
+
+    # Axes de diffusion : (CA, charges var., taux, durée, année)
+    choc_ca = np.asarray(chocs_ca, dtype=float)[:, None, None, None, None]
+    choc_var = np.asarray(chocs_charges_var, dtype=float)[None, :, None, None, None]
+    choc_taux = np.asarray(chocs_taux, dtype=float)[None, None, :, None]
+    durees = np.maximum(duree + np.asarray(chocs_duree, dtype=float), 1)
+    choc_duree = durees[None, None, None, :]
+
+    ratio_var = _safe_divide(charges_var, ca)
+    ca_stress = ca * (1 + choc_ca)
+    marge_stress = ca_stress * (1 - (ratio_var + choc_var))
+    ebitda_stress = ebitda + (marge_stress - (ca - charges_var))
+
+    annuite, interets = annual_debt_service(emprunt, taux + choc_taux, choc_duree)
+    _, interets_base = annual_debt_service(emprunt, taux, duree)
+
+    dscr = _safe_divide(ebitda_stress, annuite)
+    rnet_stress = rnet + (ebitda_stress - ebitda) - (interets - interets_base)
+
+    shape = np.broadcast_shapes(dscr.shape, rnet_stress.shape)
+    return StressGrid(
+        np.asarray(chocs_ca, dtype=float),
+        np.asarray(chocs_charges_var, dtype=float),
+        np.asarray(chocs_taux, dtype=float),
+        durees,
+        np.broadcast_to(dscr, shape),
+        np.broadcast_to(rnet_stress, shape),
+        duree,
+        missing,
+    )
@@ -16,12 +16,25 @@ from reportlab.platypus import (
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from io import BytesIO
+import hashlib
 import locale
 import json
 import sys
 import os
+import posixpath
 import re
+import threading
+import time
+
+import numpy as np
+
+from financial_engine import compute_financing, compute_stress_grid
+from image_pipeline import DEFAULT_PIPELINE
+from input_stream import RecordError, detect_format, iter_chunks, iter_records, load_json
 
 # Configuration locale pour les nombres français
 try:
@@ -38,6 +51,105 @@ ALERT_RED = colors.HexColor('#D32F2F')
 SUCCESS_GREEN = colors.HexColor('#388E3C')
 WARNING_ORANGE = colors.HexColor('#F57C00')
 
+# Logo MayFin par défaut (surchargeable par MAYFIN_LOGO_PATH ou la clé 'logo' du JSON)
+DEFAULT_LOGO_PATH = os.environ.get(
+    'MAYFIN_LOGO_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'src', 'assets', 'logo-mayfin.png')
+)
+
+# Boîtes d'affichage des images (largeur, hauteur) : logos d'en-tête, aperçus de documents
+LOGO_BOX = (3*cm, 0.8*cm)
+THUMBNAIL_BOX = (4.5*cm, 6*cm)
+
+# Sections du rapport, dans l'ordre de rendu (nom, méthode)
+SECTIONS = (
+    ('cover', 'add_cover_page'),
+    ('summary', 'add_executive_summary'),
+    ('client', 'add_client_identification'),
+    ('project', 'add_project_presentation'),
+    ('financial', 'add_financial_analysis'),
+    ('stress_test', 'add_stress_test'),
+    ('sector', 'add_sector_analysis'),
+    ('recommendation', 'add_recommendation'),
+    ('appendix', 'add_appendix'),
+)
+
+# Profils de rendu : sections incluses
+PROFILES = {
+    'full': tuple(name for name, _ in SECTIONS),
+    'preview': ('cover', 'summary'),
+}
+
+# Étapes de dégradation appliquées, dans l'ordre, quand le budget de temps
+# risque d'être dépassé : (code, libellé, sections à reconstruire)
+DEGRADATION_STEPS = (
+    ('images', "graphiques et images optionnels retirés", ('stress_test', 'appendix')),
+    ('appendix', "annexes tronquées", ('appendix',)),
+    ('compression', "flux de pages non compressés", ()),
+)
+
+# Coût de mise en page estimé (secondes par unité de poids du contenu),
+# recalibré après chaque rendu
+DEFAULT_LAYOUT_RATE = 0.0002
+
+# Gain estimé sur la mise en page et l'écriture quand les flux de pages
+# ne sont pas compressés (PDF plus volumineux)
+UNCOMPRESSED_LAYOUT_FACTOR = 0.85
+
+# Seuils d'appréciation du DSCR
+DSCR_EXCELLENT = 1.5
+DSCR_BON = 1.2
+DSCR_LIMITE = 1.0
+
+# Seuils des ratios financiers (en %) : (seuil, une valeur plus élevée est meilleure)
+RATIO_THRESHOLDS = {
+    'taux_apport': (20, True),
+    'taux_endettement': (70, False),
+    'ratio_fonds_propres': (20, True),
+    'marge_brute': (30, True),
+}
+
+# Libellés des entrées du stress-test (voir financial_engine.STRESS_TEST_CHAMPS)
+STRESS_TEST_LABELS = {
+    'emprunt': "montant emprunté",
+    'taux_interet': "taux d'intérêt",
+    'duree_mois': "durée du prêt",
+    'ca': "chiffre d'affaires année 1",
+    'charges_var': "charges variables année 1",
+    'ebitda': "EBE année 1",
+    'rnet': "résultat net année 1",
+}
+
+# Textes de l'annexe
+METHODOLOGIE = """
+Cette analyse a été réalisée selon les standards MayFin en utilisant une approche multi-critères 
+combinant l'analyse financière, l'évaluation du porteur de projet, l'analyse sectorielle et 
+l'évaluation des risques. Les ratios utilisés sont conformes aux normes bancaires et réglementaires 
+(Bâle III/IV, recommandations BCE).
+"""
+
+MENTIONS_LEGALES = """
+Ce document est confidentiel et destiné exclusivement à un usage interne MayFin. 
+Les informations contenues dans ce rapport sont basées sur les documents fournis par le client 
+et l'analyse automatisée par intelligence artificielle. Elles ne constituent pas un engagement 
+définitif de financement. Toute décision finale reste soumise à l'approbation des comités 
+d'engagement compétents et à la vérification complète du dossier.
+"""
+
+# Révision du gabarit, à incrémenter lors d'un changement de mise en page
+# non couvert par les autres composants de template_components()
+TEMPLATE_REVISION = '2.0'
+
+# Sections affectées par chaque composant du gabarit (None : toutes)
+TEMPLATE_IMPACT = {
+    'revision': None,
+    'colors': None,
+    'dscr_thresholds': ('financial', 'stress_test'),
+    'ratio_thresholds': ('financial',),
+    'methodology': ('appendix',),
+    'mentions': ('appendix',),
+}
+
 
 def format_number(value, suffix="€"):
     """Formate un nombre avec des espaces insécables"""
@@ -47,6 +159,8 @@ def format_number(value, suffix="€"):
         # Conversion en float si nécessaire
         if isinstance(value, str):
             value = float(value.replace(" ", "").replace("€", "").replace(",", "."))
+        if not np.isfinite(value):
+            return "-"
         
         # Formatage avec espaces insécables (U+00A0)
         formatted = f"{value:,.0f}".replace(",", "\u00A0")
@@ -65,6 +179,8 @@ def format_percentage(value):
     try:
         if isinstance(value, str):
             value = float(value.replace("%", "").replace(",", ".").replace(" ", ""))
+        if not np.isfinite(value):
+            return "-"
         # Formatage avec virgule française
         formatted = f"{value:.2f}".replace(".", ",")
         return f"{formatted}\u00A0%"
@@ -72,6 +188,48 @@ def format_percentage(value):
         return str(value)
 
 
+def format_ratio(value):
+    """Formate un ratio décimal (DSCR) avec virgule française"""
+    if value is None or value == "-":
+        return "-"
+    try:
+        if isinstance(value, str):
+            value = float(value.replace(",", "."))
+        if not np.isfinite(value):
+            return "-"
+        return f"{value:.2f}".replace(".", ",")
+    except:
+        return str(value)
+
+
+def computed_or(value, fallback):
+    """Retourne la valeur calculée si elle est exploitable, sinon la valeur fournie"""
+    if value is not None and np.isfinite(value):
+        return value
+    return fallback
+
+
+def template_components():
+    """Empreinte de chaque composant du gabarit (couleurs, seuils, textes)"""
+    components = {
+        'revision': TEMPLATE_REVISION,
+        'colors': [color.hexval() for color in (MAYFIN_GREEN, MAYFIN_DARK_GREY, MAYFIN_LIGHT_GREY, MAYFIN_BLUE,
+                                                ALERT_RED, SUCCESS_GREEN, WARNING_ORANGE)],
+        'dscr_thresholds': [DSCR_EXCELLENT, DSCR_BON, DSCR_LIMITE],
+        'ratio_thresholds': RATIO_THRESHOLDS,
+        'methodology': METHODOLOGIE,
+        'mentions': MENTIONS_LEGALES,
+    }
+    return {name: hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+            for name, value in components.items()}
+
+
+def template_version(components=None):
+    """Version du gabarit : empreinte de l'ensemble de ses composants"""
+    components = components or template_components()
+    return hashlib.sha256(json.dumps(components, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
 def clean_html_tags(text):
     """Supprime les balises HTML d'un texte"""
     if text is None:
@@ -81,11 +239,33 @@ def clean_html_tags(text):
     return text
 
 
+class LayoutCalibration:
+    """
+    Coût de mise en page appris sur les rendus précédents du processus
+    (moyenne mobile), partagé par les générateurs de tous les threads
+    """
+    
+    def __init__(self, rate=DEFAULT_LAYOUT_RATE):
+        self.rate = rate
+        self._lock = threading.Lock()
+    
+    def update(self, rate):
+        """Intègre le coût mesuré sur un rendu"""
+        with self._lock:
+            self.rate = 0.7 * self.rate + 0.3 * rate
+
+
+# Calibration partagée du processus
+LAYOUT_CALIBRATION = LayoutCalibration()
+
+
 class MayFinReportGenerator:
     """Générateur de rapport professionnel MayFin"""
     
-    def __init__(self, filename="rapport_analyse_financement.pdf"):
+    def __init__(self, filename="rapport_analyse_financement.pdf", images=None, time_budget=None):
         self.filename = filename
+        self.images = images or DEFAULT_PIPELINE
+        self.time_budget = time_budget
         self.doc = SimpleDocTemplate(
             filename,
             pagesize=A4,
@@ -98,6 +278,13 @@ class MayFinReportGenerator:
         )
         self.story = []
         self.styles = self._setup_styles()
+        self.financing = {}
+        self.stress_grid = None
+        self.logo = None
+        self.franchise_logo = None
+        self.profile = 'full'
+        self.degradations = []
+        self.render_info = {}
         
     def _setup_styles(self):
         """Configure les styles personnalisés"""
@@ -182,15 +369,31 @@ class MayFinReportGenerator:
         canvas.setFillColor(MAYFIN_GREEN)
         canvas.rect(0, A4[1] - 1*cm, A4[0], 0.3*cm, fill=1, stroke=0)
         
-        # Logo MayFin
-        canvas.setFont('Helvetica-Bold', 12)
-        canvas.setFillColor(MAYFIN_GREEN)
-        canvas.drawString(2*cm, A4[1] - 1.5*cm, "MAYFIN")
+        # Logo MayFin (texte si aucun logo n'est disponible)
+        text_x = 2*cm
+        if self.logo:
+            width, height = self.logo.fit(*LOGO_BOX)
+            self.images.draw_shared(canvas, self.logo, 2*cm, A4[1] - 1.95*cm, width, height)
+            text_x += width + 0.3*cm
+            title_y = A4[1] - 1.65*cm
+        else:
+            canvas.setFont('Helvetica-Bold', 12)
+            canvas.setFillColor(MAYFIN_GREEN)
+            canvas.drawString(2*cm, A4[1] - 1.5*cm, "MAYFIN")
+            title_y = A4[1] - 1.8*cm
+        
+        # Logo de la franchise
+        if self.franchise_logo:
+            width, height = self.franchise_logo.fit(*LOGO_BOX)
+            self.images.draw_shared(canvas, self.franchise_logo, A4[0] - 2*cm - width, A4[1] - 1.95*cm, width, height)
         
         # Titre du document
         canvas.setFont('Helvetica', 8)
         canvas.setFillColor(MAYFIN_DARK_GREY)
-        canvas.drawString(2*cm, A4[1] - 1.8*cm, "Analyse de Financement - Document Confidentiel")
+        title = "Analyse de Financement - Document Confidentiel"
+        if self.profile == 'preview':
+            title = "Aperçu provisoire - " + title
+        canvas.drawString(text_x, title_y, title)
         
         canvas.restoreState()
     
@@ -246,11 +449,13 @@ class MayFinReportGenerator:
         self.story.append(Spacer(1, 1*cm))
         
         # Informations principales
+        taux_apport = computed_or(self.financing.get('taux_apport'), data.get('taux_apport', 0))
+        mensualite = computed_or(self.financing.get('mensualite'), data.get('mensualite', 0))
         info_data = [
             [Paragraph("<b>Montant demandé</b>", self.styles['Normal']), format_number(data.get('montant_finance', 0))],
             [Paragraph("<b>Apport client</b>", self.styles['Normal']), format_number(data.get('apport_client', 0))],
-            [Paragraph("<b>Taux d'apport</b>", self.styles['Normal']), format_percentage(data.get('taux_apport', 0))],
-            [Paragraph("<b>Mensualité estimée</b>", self.styles['Normal']), format_number(data.get('mensualite', 0))],
+            [Paragraph("<b>Taux d'apport</b>", self.styles['Normal']), format_percentage(taux_apport)],
+            [Paragraph("<b>Mensualité estimée</b>", self.styles['Normal']), format_number(mensualite)],
         ]
         
         info_table = Table(info_data, colWidths=[8*cm, 9*cm])
@@ -269,8 +474,9 @@ class MayFinReportGenerator:
         self.story.append(Spacer(1, 1*cm))
         
         # Chargé d'affaires
+        analyste = data.get('analyste', "Système d'Analyse IA - MayFin")
         self.story.append(Paragraph(
-            f"<b>Analyste :</b> {data.get('analyste', 'Système d\\'Analyse IA - MayFin')}<br/>"
+            f"<b>Analyste :</b> {analyste}<br/>"
             f"<b>Date :</b> {datetime.now().strftime('%d/%m/%Y')}",
             self.styles['JustifiedBody']
         ))
@@ -457,18 +663,39 @@ class MayFinReportGenerator:
         self.story.append(Paragraph("3.3 Ratios financiers clés", self.styles['SubsectionTitle']))
         
         ratios = data.get('ratios', {})
+        computed = self.financing
+        
+        taux_apport = computed_or(computed.get('taux_apport'), ratios.get('taux_apport', 0))
+        taux_endettement = computed_or(computed.get('taux_endettement'), ratios.get('taux_endettement', 0))
+        ratio_fonds_propres = computed_or(computed.get('ratio_fonds_propres'), ratios.get('ratio_fonds_propres', '-'))
+        capacite_remb = computed_or(computed.get('capacite_remb'), ratios.get('capacite_remb', 0))
+        marge_brute = computed_or(computed.get('marge_brute'), ratios.get('marge_brute', 0))
+        dscr_annuels = computed.get('dscr', [])
+        dscr = computed_or(dscr_annuels[0] if dscr_annuels else None, ratios.get('dscr', '-'))
+        mensualite = computed.get('mensualite')
+        if mensualite is not None and np.isfinite(mensualite):
+            capacite_status = self._get_ratio_status(capacite_remb, mensualite, True)
+        else:
+            capacite_status = "Conforme"
+        dscr_standard = "> " + f"{DSCR_BON:g}".replace('.', ',')
         
         ratios_data = [
             [Paragraph("<b>Ratio</b>", self.styles['Normal']), 
              Paragraph("<b>Valeur</b>", self.styles['Normal']), 
              Paragraph("<b>Standard</b>", self.styles['Normal']), 
              Paragraph("<b>Analyse</b>", self.styles['Normal'])],
-            ["Taux d'apport", format_percentage(ratios.get('taux_apport', 0)), "> 20%", self._get_ratio_status(ratios.get('taux_apport', 0), 20, True)],
-            ["Taux d'endettement", format_percentage(ratios.get('taux_endettement', 0)), "< 70%", self._get_ratio_status(ratios.get('taux_endettement', 0), 70, False)],
-            ["Capacité de remboursement", format_number(ratios.get('capacite_remb', 0)), "-", "Conforme"],
-            ["DSCR (Année 1)", ratios.get('dscr', '-'), "> 1,2", self._get_dscr_status(ratios.get('dscr', 0))],
-            ["Taux de marge brute", format_percentage(ratios.get('marge_brute', 0)), "> 30%", self._get_ratio_status(ratios.get('marge_brute', 0), 30, True)],
+            ["Taux d'apport", format_percentage(taux_apport), *self._ratio_standard('taux_apport', taux_apport)],
+            ["Taux d'endettement", format_percentage(taux_endettement), *self._ratio_standard('taux_endettement', taux_endettement)],
+            ["Ratio de fonds propres", format_percentage(ratio_fonds_propres),
+             *self._ratio_standard('ratio_fonds_propres', ratio_fonds_propres)],
+            ["Capacité de remboursement", format_number(capacite_remb), "-", capacite_status],
+            ["DSCR (Année 1)", format_ratio(dscr), dscr_standard, self._get_dscr_status(dscr)],
         ]
+        # DSCR des années suivantes lorsque l'échéancier a pu être calculé
+        for annee, dscr_annee in enumerate(dscr_annuels[1:], 2):
+            if np.isfinite(dscr_annee):
+                ratios_data.append([f"DSCR (Année {annee})", format_ratio(dscr_annee), dscr_standard, self._get_dscr_status(dscr_annee)])
+        ratios_data.append(["Taux de marge brute", format_percentage(marge_brute), *self._ratio_standard('marge_brute', marge_brute)])
         
         ratios_table = Table(ratios_data, colWidths=[6*cm, 3.5*cm, 3.5*cm, 4*cm])
         ratios_table.setStyle(TableStyle([
@@ -486,6 +713,128 @@ class MayFinReportGenerator:
         ]))
         self.story.append(ratios_table)
         
+        # 3.4 Échéancier annuel de l'emprunt
+        echeancier = computed.get('echeancier_annuel', [])
+        if echeancier and np.isfinite(computed.get('mensualite', np.nan)):
+            self.story.append(Spacer(1, 0.5*cm))
+            self.story.append(Paragraph("3.4 Tableau d'amortissement annuel", self.styles['SubsectionTitle']))
+            
+            echeancier_data = [
+                [Paragraph("<b>Année</b>", self.styles['Normal']), 
+                 Paragraph("<b>Annuité</b>", self.styles['Normal']), 
+                 Paragraph("<b>Intérêts</b>", self.styles['Normal']), 
+                 Paragraph("<b>Capital</b>", self.styles['Normal']), 
+                 Paragraph("<b>Restant dû</b>", self.styles['Normal'])],
+            ]
+            for ligne in echeancier:
+                echeancier_data.append([
+                    f"Année {ligne['annee']}",
+                    format_number(ligne['annuite']),
+                    format_number(ligne['interets']),
+                    format_number(ligne['capital']),
+                    format_number(ligne['restant_du']),
+                ])
+            
+            echeancier_table = Table(echeancier_data, colWidths=[3*cm, 3.5*cm, 3.5*cm, 3.5*cm, 3.5*cm])
+            echeancier_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), MAYFIN_GREEN),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('BACKGROUND', (0, 1), (-1, -1), MAYFIN_LIGHT_GREY),
+                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+                ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.white),
+                ('TOPPADDING', (0, 0), (-1, -1), 5),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            ]))
+            self.story.append(echeancier_table)
+        
+        self.story.append(PageBreak())
+    
+    def add_stress_test(self, data):
+        """Stress-test : sensibilité du DSCR et du résultat net aux chocs"""
+        self.story.append(Paragraph("3.5 Stress-test et analyse de sensibilité", self.styles['SubsectionTitle']))
+        
+        # Grille conservée d'un passage à l'autre (reconstruction lors d'une dégradation)
+        if self.stress_grid is None:
+            self.stress_grid = compute_stress_grid(data)
+        grid = self.stress_grid
+        if not np.isfinite(grid.dscr[..., 0]).any():
+            if grid.missing:
+                missing = ", ".join(STRESS_TEST_LABELS[champ] for champ in grid.missing)
+                message = f"Stress-test non réalisé : données manquantes ou invalides ({missing})."
+            else:
+                message = "Stress-test non réalisé : DSCR de l'année 1 non calculable (chiffre d'affaires ou emprunt nul)."
+            self.story.append(Paragraph(message, self.styles['JustifiedBody']))
+            self.story.append(PageBreak())
+            return
+        
+        def fmt_pct(value):
+            return f"{round(value * 100):+d}\u00A0%"
+        
+        def fmt_pts(value):
+            return f"{value + 0:+.2f}".replace(".", ",") + "\u00A0pt"
+        
+        ca_labels = [f"CA {fmt_pct(v)}" for v in grid.chocs_ca]
+        var_base = grid.index_of(grid.chocs_charges_var, 0)
+        taux_base = grid.index_of(grid.chocs_taux, 0)
+        duree_base = grid.index_of(grid.durees, grid.duree)
+        
+        self.story.append(Paragraph(
+            f"{grid.size} scénarios évalués (chiffre d'affaires, ratio de charges variables, taux et durée). "
+            f"Le DSCR de l'année 1 reste supérieur ou égal à {format_ratio(DSCR_BON)} dans "
+            f"{format_percentage(grid.share_above(DSCR_BON) * 100)} des scénarios. Les impacts sur le "
+            f"résultat net sont calculés avant impôt.",
+            self.styles['JustifiedBody']
+        ))
+        self.story.append(Spacer(1, 0.3*cm))
+        
+        if 'images' in self.degradations:
+            self.story.append(Paragraph(
+                "Tableaux de sensibilité omis pour respecter le délai de rendu.",
+                self.styles['BulletText']
+            ))
+            self.story.append(PageBreak())
+            return
+        
+        # DSCR année 1 : CA x taux
+        dscr_taux = grid.dscr[:, var_base, :, duree_base, 0]
+        self.story.append(Paragraph("DSCR année 1 - choc sur le CA et le taux", self.styles['BulletText']))
+        self.story.append(self._get_heatmap_table(
+            "CA / Taux", ca_labels, [fmt_pts(v) for v in grid.chocs_taux], dscr_taux,
+            [[self._get_dscr_color(v) for v in row] for row in dscr_taux], format_ratio
+        ))
+        self.story.append(Spacer(1, 0.3*cm))
+        
+        # DSCR année 1 : CA x durée
+        dscr_duree = grid.dscr[:, var_base, taux_base, :, 0]
+        self.story.append(Paragraph("DSCR année 1 - choc sur le CA et la durée", self.styles['BulletText']))
+        self.story.append(self._get_heatmap_table(
+            "CA / Durée", ca_labels, [f"{d:.0f}\u00A0mois" for d in grid.durees], dscr_duree,
+            [[self._get_dscr_color(v) for v in row] for row in dscr_duree], format_ratio
+        ))
+        self.story.append(Spacer(1, 0.3*cm))
+        
+        # Résultat net année 1 : CA x charges variables
+        rnet = grid.rnet[:, :, taux_base, duree_base, 0]
+        self.story.append(Paragraph("Résultat net année 1 - choc sur le CA et les charges variables", self.styles['BulletText']))
+        self.story.append(self._get_heatmap_table(
+            "CA / Ch. var.", ca_labels, [fmt_pts(v * 100) for v in grid.chocs_charges_var], rnet,
+            [[MAYFIN_LIGHT_GREY if not np.isfinite(v) else SUCCESS_GREEN if v >= 0 else ALERT_RED for v in row]
+             for row in rnet],
+            lambda v: format_number(v, suffix="")
+        ))
+        self.story.append(Spacer(1, 0.2*cm))
+        
+        self.story.append(Paragraph(
+            f"<font color='#388E3C'>■</font> DSCR ≥ {format_ratio(DSCR_BON)}   "
+            f"<font color='#F57C00'>■</font> DSCR entre {format_ratio(DSCR_LIMITE)} et {format_ratio(DSCR_BON)}   "
+            f"<font color='#D32F2F'>■</font> DSCR &lt; {format_ratio(DSCR_LIMITE)} ou résultat négatif",
+            self.styles['BulletText']
+        ))
+        
         self.story.append(PageBreak())
     
     def add_sector_analysis(self, data):
@@ -581,17 +930,13 @@ class MayFinReportGenerator:
         
         # Méthodologie
         self.story.append(Paragraph("6.1 Méthodologie d'analyse", self.styles['SubsectionTitle']))
-        methodo_text = """
-        Cette analyse a été réalisée selon les standards MayFin en utilisant une approche multi-critères 
-        combinant l'analyse financière, l'évaluation du porteur de projet, l'analyse sectorielle et 
-        l'évaluation des risques. Les ratios utilisés sont conformes aux normes bancaires et réglementaires 
-        (Bâle III/IV, recommandations BCE).
-        """
-        self.story.append(Paragraph(methodo_text, self.styles['JustifiedBody']))
+        self.story.append(Paragraph(METHODOLOGIE, self.styles['JustifiedBody']))
         self.story.append(Spacer(1, 0.3*cm))
         
         # Sources
         sources = data.get('sources', [])
+        if 'appendix' in self.degradations:
+            sources = sources[:3]
         if sources:
             self.story.append(Paragraph("6.2 Sources documentaires", self.styles['SubsectionTitle']))
             for i, source in enumerate(sources[:10], 1):
@@ -602,36 +947,177 @@ class MayFinReportGenerator:
         
         # Mentions légales
         self.story.append(Paragraph("6.3 Mentions légales", self.styles['SubsectionTitle']))
-        mentions = """
-        Ce document est confidentiel et destiné exclusivement à un usage interne MayFin. 
-        Les informations contenues dans ce rapport sont basées sur les documents fournis par le client 
-        et l'analyse automatisée par intelligence artificielle. Elles ne constituent pas un engagement 
-        définitif de financement. Toute décision finale reste soumise à l'approbation des comités 
-        d'engagement compétents et à la vérification complète du dossier.
+        self.story.append(Paragraph(MENTIONS_LEGALES, self.styles['JustifiedBody']))
+        
+        # Aperçus des documents analysés
+        documents = data.get('documents', [])
+        if 'appendix' in self.degradations:
+            documents = []
+        if documents:
+            self.story.append(Spacer(1, 0.5*cm))
+            self.story.append(Paragraph("6.4 Documents analysés", self.styles['SubsectionTitle']))
+            
+            cells = []
+            for doc in documents[:12]:
+                prepared = None
+                if 'images' not in self.degradations:
+                    prepared = self.images.get(doc.get('apercu'), *THUMBNAIL_BOX)
+                legend = Paragraph(f"{doc.get('nom', '')}<br/><i>{doc.get('type', '')}</i>", self.styles['BulletText'])
+                if prepared:
+                    width, height = prepared.fit(*THUMBNAIL_BOX)
+                    cells.append([Image(prepared.stream(), width=width, height=height), legend])
+                else:
+                    cells.append([legend])
+            
+            rows = [cells[i:i + 3] for i in range(0, len(cells), 3)]
+            rows[-1] += [''] * (3 - len(rows[-1]))
+            documents_table = Table(rows, colWidths=[17*cm / 3] * 3)
+            documents_table.setStyle(TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ]))
+            self.story.append(documents_table)
+    
+    def build(self, data, financing=None, sections=None, profile='full'):
         """
-        self.story.append(Paragraph(mentions, self.styles['JustifiedBody']))
-    
-    def build(self, data):
-        """Construit le document PDF complet"""
-        # Ajout des sections
-        self.add_cover_page(data)
-        self.add_executive_summary(data)
-        self.add_client_identification(data)
-        self.add_project_presentation(data)
-        self.add_financial_analysis(data)
-        self.add_sector_analysis(data)
-        self.add_recommendation(data)
-        self.add_appendix(data)
+        Construit le document PDF.
+        `financing` reçoit les résultats du moteur de financement déjà calculés
+        en lot (voir generate_reports_batch) ; à défaut ils sont calculés ici.
+        `sections` restreint le rendu à certaines sections (voir SECTIONS ; un
+        nom seul est accepté), sinon celles du `profile` ('full' ou 'preview')
+        sont rendues.
+        """
+        start = time.perf_counter()
+        if profile not in PROFILES:
+            raise ValueError(f"Profil inconnu : {profile}")
+        if sections is None:
+            sections = PROFILES[profile]
+        elif isinstance(sections, str):
+            sections = (sections,)
+        unknown = set(sections) - {name for name, _ in SECTIONS}
+        if unknown:
+            raise ValueError(f"Sections inconnues : {', '.join(sorted(unknown))}")
+        self.profile = profile
+        self.degradations = []
+        
+        if financing is None:
+            financing = compute_financing([data]).dossier(0)
+        self.financing = financing
+        self.stress_grid = None
+        self.logo = self.images.get(data.get('logo', DEFAULT_LOGO_PATH), *LOGO_BOX)
+        self.franchise_logo = self.images.get(data.get('franchise_logo'), *LOGO_BOX)
+        
+        # Ajout des sections, chacune chronométrée
+        section_stories = {}
+        section_times = {}
+        for name, method in SECTIONS:
+            if name in sections:
+                section_stories[name] = self._render_section(method, data, section_times, name)
+        
+        # Dégradation progressive si le budget de temps risque d'être dépassé
+        if self.time_budget is not None:
+            for step, label, affected in DEGRADATION_STEPS:
+                elapsed = time.perf_counter() - start
+                if elapsed + self._predict_layout(section_stories) <= self.time_budget:
+                    break
+                self.degradations.append(step)
+                if step == 'images':
+                    self.franchise_logo = None
+                for name in affected:
+                    if name in section_stories:
+                        method = dict(SECTIONS)[name]
+                        section_stories[name] = self._render_section(method, data, section_times, name)
+        
+        self.story = [flowable for name, _ in SECTIONS if name in section_stories
+                      for flowable in section_stories[name]]
+        if self.degradations:
+            self._add_degradation_note()
+        if 'compression' in self.degradations:
+            self.doc.pageCompression = 0
         
         # Construction du PDF
+        predicted = self._predict_layout(section_stories)
+        layout_start = time.perf_counter()
         self.doc.build(
             self.story,
             onFirstPage=self._create_header,
             onLaterPages=self._create_header
         )
-        
+        layout_time = time.perf_counter() - layout_start
+        self._calibrate_layout(section_stories, layout_time)
+        
+        elapsed = time.perf_counter() - start
+        self.render_info = {
+            'profile': profile,
+            'sections': {name: round(t, 4) for name, t in section_times.items()},
+            'layout': round(layout_time, 4),
+            'predicted_layout': round(predicted, 4),
+            'elapsed': round(elapsed, 4),
+            'time_budget': self.time_budget,
+            'deadline_met': self.time_budget is None or elapsed <= self.time_budget,
+            'degradations': list(self.degradations),
+            'pages': self.doc.page,
+            'template_version': template_version(),
+        }
         return self.filename
     
+    def _render_section(self, method, data, timings, name):
+        """Exécute une méthode add_* et retourne ses flowables, en mesurant sa durée"""
+        story, self.story = self.story, []
+        section_start = time.perf_counter()
+        getattr(self, method)(data)
+        timings[name] = timings.get(name, 0) + time.perf_counter() - section_start
+        section_story, self.story = self.story, story
+        return section_story
+    
+    def _story_weight(self, flowables):
+        """Poids de mise en page d'une liste de flowables (cellules, texte, images)"""
+        weight = 0.0
+        for flowable in flowables:
+            if isinstance(flowable, Table):
+                weight += 2 + sum(self._cell_weight(cell) for row in flowable._cellvalues for cell in row)
+            elif isinstance(flowable, Paragraph):
+                weight += 1 + len(flowable.text) / 200
+            elif isinstance(flowable, Image):
+                weight += 20
+            else:
+                weight += 0.1
+        return weight
+    
+    def _cell_weight(self, cell):
+        """Poids d'une cellule de tableau"""
+        if isinstance(cell, (list, tuple)):
+            return self._story_weight(cell)
+        if isinstance(cell, (Paragraph, Image, Table)):
+            return self._story_weight([cell])
+        return 0.3
+    
+    def _predict_layout(self, section_stories):
+        """Durée de mise en page prévue pour les sections construites"""
+        weight = sum(self._story_weight(story) for story in section_stories.values())
+        predicted = weight * LAYOUT_CALIBRATION.rate
+        if 'compression' in self.degradations:
+            predicted *= UNCOMPRESSED_LAYOUT_FACTOR
+        return predicted
+    
+    def _calibrate_layout(self, section_stories, layout_time):
+        """Recalibre le coût de mise en page (moyenne mobile) à partir du rendu mesuré"""
+        weight = sum(self._story_weight(story) for story in section_stories.values())
+        if weight <= 0:
+            return
+        if 'compression' in self.degradations:
+            layout_time /= UNCOMPRESSED_LAYOUT_FACTOR
+        LAYOUT_CALIBRATION.update(layout_time / weight)
+    
+    def _add_degradation_note(self):
+        """Ajoute une note signalant les adaptations appliquées pour tenir le délai"""
+        labels = [label for step, label, _ in DEGRADATION_STEPS if step in self.degradations]
+        note = "Document généré en mode allégé pour respecter le délai de rendu : " + ", ".join(labels) + "."
+        self.story.insert(0, Paragraph(f"<i>{note}</i>", self.styles['BulletText']))
+        self.doc.subject = note
+    
     # Méthodes utilitaires
     def _get_score_color(self, score):
         """Retourne la couleur selon le score"""
@@ -671,21 +1157,70 @@ class MayFinReportGenerator:
         except:
             return "-"
     
+    def _ratio_standard(self, name, value):
+        """Norme affichée et statut d'un ratio selon RATIO_THRESHOLDS"""
+        threshold, higher_better = RATIO_THRESHOLDS[name]
+        standard = f"{'>' if higher_better else '<'} {threshold}%"
+        return standard, self._get_ratio_status(value, threshold, higher_better)
+    
     def _get_dscr_status(self, dscr):
         """Évalue le DSCR"""
         try:
-            dscr_val = float(dscr) if dscr != '-' else 0
-            if dscr_val >= 1.5:
+            dscr_val = float(str(dscr).replace(',', '.')) if dscr != '-' else 0
+            if dscr_val >= DSCR_EXCELLENT:
                 return "✓ Excellent"
-            elif dscr_val >= 1.2:
+            elif dscr_val >= DSCR_BON:
                 return "✓ Bon"
-            elif dscr_val >= 1.0:
+            elif dscr_val >= DSCR_LIMITE:
                 return "⚠ Limite"
             else:
                 return "✗ Insuffisant"
         except:
             return "-"
     
+    def _get_dscr_color(self, dscr):
+        """Retourne la couleur selon le DSCR (mêmes seuils que _get_dscr_status)"""
+        if dscr is None or not np.isfinite(dscr):
+            return MAYFIN_LIGHT_GREY
+        if dscr >= DSCR_BON:
+            return SUCCESS_GREEN
+        elif dscr >= DSCR_LIMITE:
+            return WARNING_ORANGE
+        else:
+            return ALERT_RED
+    
+    def _get_heatmap_table(self, title, row_labels, col_labels, values, cell_colors, formatter):
+        """Construit un tableau de type heatmap (une couleur de fond par cellule)"""
+        header = [Paragraph(f"<b>{title}</b>", self.styles['Normal'])] + col_labels
+        rows = [header]
+        for label, row in zip(row_labels, values):
+            rows.append([label] + [formatter(v) for v in row])
+        
+        label_width = 3*cm
+        col_width = (17*cm - label_width) / max(len(col_labels), 1)
+        table = Table(rows, colWidths=[label_width] + [col_width] * len(col_labels))
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), MAYFIN_GREEN),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('BACKGROUND', (0, 1), (0, -1), MAYFIN_LIGHT_GREY),
+            ('TEXTCOLOR', (1, 1), (-1, -1), colors.white),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.white),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]
+        for i, row in enumerate(cell_colors, 1):
+            for j, color in enumerate(row, 1):
+                style.append(('BACKGROUND', (j, i), (j, i), color))
+                if color == MAYFIN_LIGHT_GREY:
+                    style.append(('TEXTCOLOR', (j, i), (j, i), MAYFIN_DARK_GREY))
+        table.setStyle(TableStyle(style))
+        return table
+    
     def _get_info_table_style(self):
         """Style pour les tableaux d'information"""
         return TableStyle([
@@ -702,20 +1237,270 @@ class MayFinReportGenerator:
         ])
 
 
-def generate_report_from_json(data_json_path, output_path):
-    """Génère un rapport depuis un fichier JSON"""
+def render_to_bytes(data, financing=None, time_budget=None, **build_options):
+    """Rend un rapport en mémoire et retourne (octets du PDF, informations de rendu)"""
+    buffer = BytesIO()
+    generator = MayFinReportGenerator(filename=buffer, time_budget=time_budget)
+    generator.build(data, financing=financing, **build_options)
+    return buffer.getvalue(), generator.render_info
+
+
+def generate_report_from_json(data_json_path, output_path, time_budget=None, sink=None, manifest=None,
+                              skip_current=False):
+    """
+    Génère un rapport depuis un fichier JSON.
+    Avec `sink` (StorageSink), le PDF est rendu en mémoire et envoyé vers le
+    stockage ; `output_path` désigne alors le chemin de l'objet dans le bucket.
+    Avec `manifest` (RenderManifest), le rapport produit y est inscrit ;
+    `skip_current` évite alors de rendre à nouveau un rapport déjà à jour.
+    """
     try:
-        with open(data_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(data_json_path)
         
-        generator = MayFinReportGenerator(filename=output_path)
-        pdf_file = generator.build(data)
+        if skip_current and manifest is not None and _is_current(manifest, data, output_path, sink):
+            return _skipped(output_path, sink)
         
-        return {'success': True, 'file': pdf_file}
+        if sink is not None:
+            pdf, render_info = render_to_bytes(data, time_budget=time_budget)
+            result = sink.upload(pdf, output_path)
+            result['render'] = render_info
+        else:
+            generator = MayFinReportGenerator(filename=output_path, time_budget=time_budget)
+            pdf_file = generator.build(data)
+            result = {'success': True, 'file': pdf_file, 'bytes': os.path.getsize(pdf_file),
+                      'render': generator.render_info}
+        
+        if manifest is not None:
+            manifest.record(data, result)
+        return result
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
 
+def compute_financing_safe(dossiers):
+    """
+    Indicateurs de financement de chaque dossier, calculés en une passe.
+    Si le lot échoue, chaque dossier est recalculé seul : ceux en échec
+    reçoivent l'exception levée à la place de leurs indicateurs.
+    """
+    try:
+        financing = compute_financing(dossiers)
+        return [financing.dossier(index) for index in range(len(dossiers))]
+    except Exception:
+        pass
+    results = []
+    for data in dossiers:
+        try:
+            results.append(compute_financing([data]).dossier(0))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def generate_reports_batch(dossiers, output_paths):
+    """
+    Génère les rapports d'un portefeuille de dossiers.
+    Les indicateurs de financement sont calculés en une seule passe vectorisée
+    puis transmis à chaque rapport.
+    """
+    results = []
+    for data, output_path, financing in zip(dossiers, output_paths, compute_financing_safe(dossiers)):
+        if isinstance(financing, Exception):
+            results.append({'success': False, 'error': str(financing)})
+            continue
+        try:
+            generator = MayFinReportGenerator(filename=output_path)
+            pdf_file = generator.build(data, financing=financing)
+            results.append({'success': True, 'file': pdf_file})
+        except Exception as e:
+            results.append({'success': False, 'error': str(e)})
+    return results
+
+
+def _render_dossier(data, output_path, financing, time_budget=None):
+    """Rendu d'un dossier dans un worker du pool"""
+    try:
+        generator = MayFinReportGenerator(filename=output_path, time_budget=time_budget)
+        pdf_file = generator.build(data, financing=financing)
+        return {'success': True, 'file': pdf_file, 'bytes': os.path.getsize(pdf_file),
+                'render': generator.render_info}
+    except Exception as e:
+        return {'success': False, 'file': output_path, 'error': str(e)}
+
+
+def _render_dossier_bytes(data, object_path, financing, time_budget=None):
+    """Rendu en mémoire d'un dossier dans un worker du pool, avant envoi"""
+    try:
+        pdf, render_info = render_to_bytes(data, financing=financing, time_budget=time_budget)
+        return {'success': True, 'object': object_path, 'pdf': pdf, 'render': render_info}
+    except Exception as e:
+        return {'success': False, 'object': object_path, 'error': str(e)}
+
+
+def _collect(done, pending, uploads, sink, manifest):
+    """
+    Traite des rendus ou envois terminés : les rendus en mémoire partent vers
+    l'envoi, les rapports produits sont inscrits au manifeste. Un futur en
+    échec (worker interrompu, erreur d'envoi) donne un résultat en échec.
+    """
+    for future in done:
+        if future in pending:
+            data, output_path = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                yield {'success': False, 'file' if sink is None else 'object': output_path, 'error': str(e)}
+                continue
+            if sink is not None and result['success']:
+                upload = sink.submit(result.pop('pdf'), result['object'])
+                uploads[upload] = (data, result)
+                continue
+        else:
+            data, render = uploads.pop(future)
+            try:
+                result = {**render, **future.result()}
+            except Exception as e:
+                result = {**render, 'success': False, 'error': str(e)}
+        if manifest is not None and result['success']:
+            manifest.record(data, result)
+        yield result
+
+
+def _is_current(manifest, data, output_path, sink):
+    """Vrai si le manifeste atteste un rapport existant pour ce dossier, avec le gabarit actuel"""
+    if sink is None:
+        return os.path.exists(output_path) and manifest.is_current(data, 'file', os.path.abspath(output_path))
+    return manifest.is_current(data, sink.bucket, output_path)
+
+
+def _skipped(output_path, sink):
+    """Résultat d'un rendu évité car le rapport est à jour"""
+    if sink is None:
+        return {'success': True, 'file': output_path, 'skipped': True}
+    return {'success': True, 'bucket': sink.bucket, 'object': output_path, 'skipped': True}
+
+
+def _output_name(data, index):
+    """Nom du PDF d'un dossier : identifiant du dossier s'il existe, sinon son rang"""
+    identifier = str(data.get('id') or data.get('dossier_id') or index)
+    return "rapport_" + re.sub(r'[^A-Za-z0-9_.-]', '_', identifier) + ".pdf"
+
+
+def render_items(items, workers=None, chunk_size=64, time_budget=None, sink=None, manifest=None,
+                 skip_current=False):
+    """
+    Rend des couples (dossier, chemin de sortie) dans un pool de processus.
+    Les dossiers sont regroupés par lots de `chunk_size`, dont les indicateurs
+    de financement sont calculés en une passe, puis envoyés aux workers sans
+    attendre la fin de l'itérable. Le nombre de rendus en attente est borné
+    pour garder une mémoire constante.
+    Produit un résultat par dossier, dans l'ordre de fin de rendu.
+    Avec `sink` (StorageSink), les PDF sont rendus en mémoire puis envoyés et
+    les chemins désignent des objets du bucket. Avec `manifest`
+    (RenderManifest), chaque rapport produit y est inscrit ; `skip_current`
+    évite alors de rendre à nouveau les rapports déjà à jour.
+    Un enregistrement illisible (RecordError) ou un worker interrompu donne un
+    résultat en échec sans arrêter le flux ; un pool interrompu est remplacé.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    pending = {}
+    uploads = {}
+    
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        index = 0
+        for chunk in iter_chunks(items, chunk_size):
+            financing = compute_financing_safe([data for data, _ in chunk])
+            for (data, output_path), dossier_financing in zip(chunk, financing):
+                if len(pending) + len(uploads) >= max_pending:
+                    done, _ = wait(set(pending) | set(uploads), return_when=FIRST_COMPLETED)
+                    yield from _collect(done, pending, uploads, sink, manifest)
+                if isinstance(data, RecordError):
+                    yield {'success': False, 'error': f"Dossier n°{index} : {data}"}
+                    index += 1
+                    continue
+                if not isinstance(data, dict):
+                    yield {'success': False, 'error': f"Dossier n°{index} invalide : objet JSON attendu"}
+                    index += 1
+                    continue
+                if skip_current and manifest is not None and _is_current(manifest, data, output_path, sink):
+                    yield _skipped(output_path, sink)
+                    index += 1
+                    continue
+                if isinstance(dossier_financing, Exception):
+                    yield {'success': False, 'file' if sink is None else 'object': output_path,
+                           'error': f"Dossier n°{index} : {dossier_financing}"}
+                    index += 1
+                    continue
+                task = _render_dossier if sink is None else _render_dossier_bytes
+                try:
+                    future = executor.submit(task, data, output_path, dossier_financing, time_budget)
+                except BrokenProcessPool:
+                    # Les rendus en attente sur l'ancien pool sont reportés en échec par _collect
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                    future = executor.submit(task, data, output_path, dossier_financing, time_budget)
+                pending[future] = (data, output_path)
+                index += 1
+            del chunk, financing
+        
+        while pending or uploads:
+            done, _ = wait(set(pending) | set(uploads), return_when=FIRST_COMPLETED)
+            yield from _collect(done, pending, uploads, sink, manifest)
+    finally:
+        executor.shutdown()
+
+
+def generate_reports_from_stream(input_path, output_dir, workers=None, chunk_size=64, time_budget=None,
+                                 sink=None, manifest=None, skip_current=False):
+    """
+    Génère les rapports d'un export de dossiers (JSON, NDJSON brut/gzip/zstd
+    ou msgpack) lu en flux, via render_items.
+    `time_budget` (secondes) s'applique à chaque rapport.
+    Avec `sink` (StorageSink), les PDF sont rendus en mémoire puis envoyés
+    pendant que les rendus suivants se poursuivent ; `output_dir` est alors
+    le préfixe des objets dans le bucket.
+    """
+    if sink is None:
+        os.makedirs(output_dir, exist_ok=True)
+    join = os.path.join if sink is None else posixpath.join
+    items = ((data, join(output_dir, _output_name(data, index)) if isinstance(data, dict) else None)
+             for index, data in enumerate(iter_records(input_path)))
+    yield from render_items(items, workers, chunk_size, time_budget, sink, manifest, skip_current)
+
+
+# File de rendu en arrière-plan des rapports complets demandés après un aperçu
+_background_executor = None
+
+
+def _get_background_executor():
+    """Crée à la demande la file de rendu en arrière-plan"""
+    global _background_executor
+    if _background_executor is None:
+        _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mayfin-full')
+    return _background_executor
+
+
+def generate_preview(data, preview_path, full_path=None):
+    """
+    Génère un aperçu rapide (couverture + synthèse exécutive).
+    Si `full_path` est fourni, le rapport complet est mis en file d'attente en
+    arrière-plan en réutilisant les indicateurs déjà calculés pour l'aperçu ;
+    le futur retourné donne son résultat.
+    """
+    try:
+        generator = MayFinReportGenerator(filename=preview_path)
+        pdf_file = generator.build(data, profile='preview')
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, None
+    
+    future = None
+    if full_path:
+        future = _get_background_executor().submit(_render_dossier, data, full_path, generator.financing)
+    return {'success': True, 'file': pdf_file}, future
+
+
 def get_sample_data():
     """Retourne les données d'exemple (Quadra Terra)"""
     return {
@@ -752,6 +1537,8 @@ def get_sample_data():
         'apport_client': 25000,
         'taux_apport': 23.7,
         'mensualite': 1519,
+        'taux_interet': 5.5,
+        'duree_mois': 84,
         
         'financement': {
             'investissements': 100507,
@@ -860,9 +1647,19 @@ def get_sample_data():
 
 def main():
     """Fonction principale"""
-    if len(sys.argv) == 3:
+    manifest = None
+    if len(sys.argv) == 3 and os.environ.get('MAYFIN_MANIFEST_PATH'):
+        # Inscription des rapports produits au manifeste (voir render_manifest.py)
+        from render_manifest import RenderManifest
+        manifest = RenderManifest(os.environ['MAYFIN_MANIFEST_PATH'])
+    
+    if len(sys.argv) == 3 and (detect_format(sys.argv[1]) != 'json' or os.path.isdir(sys.argv[2])):
+        # Mode flux: python script.py dossiers.ndjson.gz dossier_sortie/
+        for result in generate_reports_from_stream(sys.argv[1], sys.argv[2], manifest=manifest):
+            print(json.dumps(result), flush=True)
+    elif len(sys.argv) == 3:
         # Mode CLI: python script.py input.json output.pdf
-        result = generate_report_from_json(sys.argv[1], sys.argv[2])
+        result = generate_report_from_json(sys.argv[1], sys.argv[2], manifest=manifest)
         print(json.dumps(result))
     else:
         # Mode test avec données d'exemple
@@ -881,7 +1678,10 @@ def main():
         print("   ✓ Analyse financière complète avec ratios bancaires")
         print("   ✓ Formatage professionnel (nombres, textes justifiés)")
         print("   ✓ Structure conforme aux standards bancaires")
-        print("   ✓ 8 pages structurées et lisibles")
+        print("   ✓ 9 pages structurées et lisibles")
+    
+    if manifest is not None:
+        manifest.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline d'images - MayFin
+Décodage unique, réduction à la résolution cible et cache par empreinte
+du contenu pour les logos, visuels de franchise et aperçus de documents,
+avec un pack d'images préparées au déploiement partagé entre processus (mmap)
+"""
+
+from collections import OrderedDict
+from io import BytesIO
+import base64
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+from PIL import Image as PILImage
+from reportlab.lib.utils import ImageReader
+
+# Résolution cible des images embarquées
+DEFAULT_DPI = 150
+
+# Budget mémoire du cache (octets d'images réencodées)
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Qualité JPEG des images opaques réencodées
+JPEG_QUALITY = 85
+
+# Nombre d'empreintes de fichiers mémorisées (chemin, date, taille)
+DIGEST_CACHE_ENTRIES = 4096
+
+# En-tête du pack d'assets : signature, version du format, taille de l'index JSON
+PACK_MAGIC = b'MAYFINPK'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<8sII')
+
+# Alignement (octets) de la zone de données et de chaque image du pack
+PACK_ALIGNMENT = 64
+
+
+class PreparedImage:
+    """Image réduite et réencodée, prête à être embarquée dans un PDF"""
+
+    def __init__(self, key, data, pixel_size, is_jpeg):
+        self.key = key
+        self.data = data
+        self.pixel_size = pixel_size
+        self.is_jpeg = is_jpeg
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        """Nom stable de l'image, identique d'un PDF à l'autre"""
+        return f"img_{self.key[0][:16]}_{self.pixel_size[0]}x{self.pixel_size[1]}"
+
+    @property
+    def aspect(self):
+        """Rapport hauteur / largeur"""
+        return self.pixel_size[1] / self.pixel_size[0]
+
+    def stream(self):
+        """Flux binaire des octets réencodés (pour platypus.Image)"""
+        return BytesIO(self.data)
+
+    def reader(self):
+        """
+        Lecteur ReportLab sur les octets réencodés. Un JPEG est recopié tel quel
+        dans le PDF (DCTDecode), sans recompression. Pour une image avec
+        transparence, le lecteur est conservé avec ses plans RGB et alpha
+        décodés, réutilisés d'un PDF à l'autre ; ReportLab refait toutefois la
+        compression Flate de l'image et de son SMask pour chaque PDF.
+        """
+        if self.is_jpeg:
+            return ImageReader(self.stream())
+        with self._lock:
+            if self._reader is None:
+                reader = ImageReader(self.stream())
+                reader.getRGBData()
+                self._reader = reader
+        return self._reader
+
+    def fit(self, max_width, max_height):
+        """Dimensions (points) conservant les proportions dans une boîte"""
+        width = max_width
+        height = width * self.aspect
+        if height > max_height:
+            height = max_height
+            width = height / self.aspect
+        return width, height
+
+
+def pack_align(offset):
+    """Arrondit une position du pack à l'alignement supérieur"""
+    return -(-offset // PACK_ALIGNMENT) * PACK_ALIGNMENT
+
+
+class AssetPack:
+    """
+    Pack d'images préparées au déploiement (voir asset_pack.py), projeté en
+    mémoire en lecture seule : les octets des images ne sont ni copiés ni
+    décodés au chargement, et les pages sont partagées entre tous les workers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_size = PACK_HEADER.unpack_from(self._map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self._map.close()
+            raise ValueError(f"Pack d'assets invalide : {path}")
+        index = json.loads(self._map[PACK_HEADER.size:PACK_HEADER.size + index_size])
+
+        view = memoryview(self._map)[pack_align(PACK_HEADER.size + index_size):]
+        self._images = {}
+        for entry in index['images']:
+            key = (entry['digest'], tuple(entry['box']))
+            data = view[entry['offset']:entry['offset'] + entry['length']]
+            self._images[key] = PreparedImage(key, data, tuple(entry['size']), entry['jpeg'])
+
+    def get(self, key):
+        """Image préparée pour une clé (empreinte, taille cible en pixels), None si absente"""
+        return self._images.get(key)
+
+    def __len__(self):
+        return len(self._images)
+
+
+def open_asset_pack(path):
+    """Ouvre un pack d'assets ; None si le chemin est vide, absent ou invalide"""
+    if not path:
+        return None
+    try:
+        return AssetPack(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+class ImagePipeline:
+    """
+    Cache LRU d'images préparées, partagé entre les rapports d'un même processus.
+    Le pack d'assets éventuel (`pack`) est consulté en premier.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, dpi=DEFAULT_DPI, pack=None):
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.pack = pack
+        self._cache = OrderedDict()
+        self._size = 0
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.pack_hits = 0
+
+    def _read_source(self, source):
+        """Retourne (empreinte, octets ou None) d'une source : chemin, octets ou data URI"""
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+            return hashlib.sha256(data).hexdigest(), data
+        if isinstance(source, str) and source.startswith('data:'):
+            data = base64.b64decode(source.split(',', 1)[1])
+            return hashlib.sha256(data).hexdigest(), data
+
+        # Fichier : l'empreinte est mémorisée tant que le fichier n'a pas changé
+        stat = os.stat(source)
+        stamp = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(stamp)
+            if digest is not None:
+                self._digests.move_to_end(stamp)
+        if digest is not None:
+            return digest, None
+        with open(source, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._digests[stamp] = digest
+            while len(self._digests) > DIGEST_CACHE_ENTRIES:
+                self._digests.popitem(last=False)
+        return digest, data
+
+    def _prepare(self, key, data, max_pixels):
+        """Décode, réduit et réencode une image"""
+        im = PILImage.open(BytesIO(data))
+        # Décodage JPEG directement à une échelle réduite quand c'est possible
+        im.draft('RGB', max_pixels)
+        im.thumbnail(max_pixels, PILImage.LANCZOS)
+
+        has_alpha = im.mode in ('RGBA', 'LA') or (im.mode == 'P' and 'transparency' in im.info)
+        out = BytesIO()
+        if has_alpha:
+            im.convert('RGBA').save(out, format='PNG', optimize=True)
+        else:
+            im.convert('RGB').save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        return PreparedImage(key, out.getvalue(), im.size, not has_alpha)
+
+    def get(self, source, width, height):
+        """
+        Image préparée pour une boîte de `width` x `height` points.
+        Retourne None si la source est absente ou illisible.
+        """
+        if not source:
+            return None
+        max_pixels = (max(1, round(width / 72 * self.dpi)), max(1, round(height / 72 * self.dpi)))
+        try:
+            digest, data = self._read_source(source)
+        except (OSError, ValueError):
+            return None
+        key = (digest, max_pixels)
+        packed = self.pack.get(key) if self.pack is not None else None
+
+        with self._lock:
+            if packed is not None:
+                self.pack_hits += 1
+                return packed
+            prepared = self._cache.get(key)
+            if prepared is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+
+        if data is None:
+            try:
+                with open(source, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+        try:
+            prepared = self._prepare(key, data, max_pixels)
+        except (OSError, ValueError, PILImage.DecompressionBombError):
+            return None
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = prepared
+                self._size += len(prepared.data)
+                while self._size > self.max_bytes and len(self._cache) > 1:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._size -= len(evicted.data)
+        return prepared
+
+    def draw_shared(self, canvas, prepared, x, y, width, height):
+        """
+        Dessine une image via une Form XObject propre au document : l'image
+        est embarquée une seule fois par PDF puis référencée sur chaque page.
+        """
+        form_name = f"form_{prepared.name}_{width:.0f}x{height:.0f}"
+        if not canvas.hasForm(form_name):
+            canvas.saveState()
+            canvas.beginForm(form_name, lowerx=0, lowery=0, upperx=width, uppery=height)
+            canvas.drawImage(prepared.reader(), 0, 0, width, height, mask='auto')
+            canvas.endForm()
+            canvas.restoreState()
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.doForm(form_name)
+        canvas.restoreState()
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._cache.clear()
+            self._digests.clear()
+            self._size = 0
+
+
+# Pipeline partagé par défaut entre tous les générateurs du processus, adossé
+# au pack d'assets désigné par MAYFIN_ASSET_PACK s'il existe
+DEFAULT_PIPELINE = ImagePipeline(pack=open_asset_pack(os.environ.get('MAYFIN_ASSET_PACK')))
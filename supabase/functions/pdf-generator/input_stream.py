@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture en flux des dossiers - MayFin
+Décodage incrémental de fichiers JSON, NDJSON (brut, gzip, zstd) et msgpack
+à mémoire bornée, quelle que soit la taille de l'export
+"""
+
+import gzip
+import io
+import json
+
+# Décodeur JSON rapide si disponible, bibliothèque standard sinon
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+MSGPACK_EXTENSIONS = ('.msgpack', '.mpk')
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+# Taille des lectures dans le flux décompressé
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+class RecordError(ValueError):
+    """Enregistrement illisible d'un flux, produit à la place du dossier"""
+
+
+def open_input(path):
+    """Ouvre un fichier en binaire en décompressant gzip ou zstd à la volée"""
+    raw = open(path, 'rb')
+    magic = raw.peek(4)[:4] if hasattr(raw, 'peek') else b''
+    if magic.startswith(GZIP_MAGIC):
+        # GzipFile ne ferme pas un fichier fourni par fileobj : réouverture par chemin
+        raw.close()
+        return gzip.open(path, 'rb')
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raw.close()
+            raise ImportError("Le module 'zstandard' est requis pour lire les fichiers .zst")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE)
+    return raw
+
+
+def _base_name(path):
+    """Nom du fichier sans les extensions de compression"""
+    name = str(path).lower()
+    for ext in ('.gz', '.gzip', '.zst', '.zstd'):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+
+def detect_format(path):
+    """Détecte le format logique du fichier : 'msgpack', 'ndjson' ou 'json'"""
+    name = _base_name(path)
+    if name.endswith(MSGPACK_EXTENSIONS):
+        return 'msgpack'
+    if name.endswith(NDJSON_EXTENSIONS):
+        return 'ndjson'
+    return 'json'
+
+
+def iter_records(path, fmt=None):
+    """
+    Itère sur les dossiers d'un fichier au fur et à mesure du décodage.
+    Un fichier JSON classique contient un dossier ou une liste de dossiers
+    et est chargé en entier ; NDJSON et msgpack sont lus en flux.
+    Une ligne NDJSON illisible produit une RecordError (avec son numéro de
+    ligne) à la place du dossier, et la lecture se poursuit.
+    """
+    fmt = fmt or detect_format(path)
+    with open_input(path) as stream:
+        if fmt == 'msgpack':
+            if msgpack is None:
+                raise ImportError("Le module 'msgpack' est requis pour lire les fichiers msgpack")
+            unpacker = msgpack.Unpacker(stream, raw=False, read_size=READ_BUFFER_SIZE)
+            for record in unpacker:
+                yield record
+        elif fmt == 'ndjson':
+            for number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json_loads(line)
+                except ValueError as e:
+                    record = RecordError(f"ligne {number} : {e}")
+                yield record
+        else:
+            document = json_loads(stream.read())
+            if isinstance(document, list):
+                yield from document
+            else:
+                yield document
+
+
+def load_json(path):
+    """Charge un dossier unique depuis un fichier JSON (éventuellement compressé)"""
+    with open_input(path) as stream:
+        return json_loads(stream.read())
+
+
+def iter_chunks(records, size):
+    """Regroupe un itérable de dossiers en listes de `size` éléments au plus"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc de charge du générateur de rapports - MayFin
+Simule des rafales de demandes de rapports simultanées (après comité) et
+mesure débit, latences p50/p95/p99, taux d'erreur, RSS max par worker et CPU
+
+Usage :
+    python load_test.py --requests 200 --concurrency 16 --mode inprocess
+    python load_test.py --requests 100 --concurrency 8 --rate 20 --mode cli --output charge.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import copy
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_mayfin_report import generate_report_from_json, get_sample_data
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_mayfin_report.py')
+
+
+def generate_dossier(seed):
+    """Dossier réaliste obtenu par variation déterministe des données d'exemple"""
+    rng = random.Random(seed)
+    data = copy.deepcopy(get_sample_data())
+    echelle = rng.uniform(0.4, 3.0)
+
+    data['entreprise'] = f"{data['entreprise']} #{seed}"
+    data['score'] = rng.randint(20, 95)
+    data['taux_interet'] = round(rng.uniform(3.0, 7.5), 2)
+    data['duree_mois'] = rng.choice([36, 48, 60, 84, 120])
+
+    financement = data['financement']
+    for key in financement:
+        financement[key] = round(financement[key] * echelle)
+    data['montant_finance'] = financement['emprunt']
+    data['apport_client'] = financement['apport']
+
+    for annee in data['previsionnels'].values():
+        variation = rng.uniform(0.7, 1.3)
+        for key in annee:
+            annee[key] = round(annee[key] * echelle * variation)
+
+    # Longueur variable des sections textuelles et des listes
+    risques = data['secteur']['risques']
+    data['secteur']['risques'] = [rng.choice(risques) for _ in range(rng.randint(2, 8))]
+    data['points_forts'] = rng.sample(data['points_forts'], rng.randint(1, len(data['points_forts'])))
+    data['secteur']['contexte'] = " ".join([data['secteur']['contexte']] * rng.randint(1, 4))
+    data['recommendation']['decision'] = rng.choice(['FAVORABLE', 'À ÉTUDIER AVEC RÉSERVES', 'DÉFAVORABLE'])
+    return data
+
+
+def _run_inprocess(input_path, output_path):
+    """Rendu dans un worker du pool (API Python generate_report_from_json)"""
+    start = time.perf_counter()
+    result = generate_report_from_json(input_path, output_path)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'success': result['success'],
+        'error': result.get('error'),
+        'service_time': time.perf_counter() - start,
+        'pid': os.getpid(),
+        'max_rss_kb': usage.ru_maxrss,
+        'cpu_time': usage.ru_utime + usage.ru_stime,
+    }
+
+
+def _warmup(_):
+    """Tâche vide forçant le démarrage d'un worker"""
+    return os.getpid()
+
+
+def _run_cli(input_path, output_path):
+    """Rendu par un sous-processus CLI (python generate_mayfin_report.py in.json out.pdf)"""
+    start = time.perf_counter()
+    # stderr dans un fichier temporaire : un seul tube à vider, sans risque
+    # d'interblocage ; wait4 (et non communicate) pour obtenir le rusage du fils
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(
+            [sys.executable, SCRIPT_PATH, input_path, output_path],
+            stdout=subprocess.PIPE, stderr=stderr_file,
+        )
+        stdout = proc.stdout.read()
+        proc.stdout.close()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    try:
+        result = json.loads(stdout.decode('utf-8').strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        result = {'success': False, 'error': stderr.decode('utf-8', 'replace')[-500:]}
+    return {
+        'success': proc.returncode == 0 and result.get('success', False),
+        'error': result.get('error'),
+        'service_time': time.perf_counter() - start,
+        'pid': proc.pid,
+        'max_rss_kb': usage.ru_maxrss,
+        'cpu_time': usage.ru_utime + usage.ru_stime,
+    }
+
+
+def percentile(values, pct):
+    """Percentile par interpolation linéaire"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def arrival_times(count, rate, seed):
+    """Instants d'arrivée : rafale si rate <= 0, sinon processus de Poisson de débit `rate`/s"""
+    if rate <= 0:
+        return [0.0] * count
+    rng = random.Random(seed)
+    t = 0.0
+    times = []
+    for _ in range(count):
+        times.append(t)
+        t += rng.expovariate(rate)
+    return times
+
+
+def run_load_test(requests=100, concurrency=8, rate=0.0, mode='inprocess', seed=42, workdir=None):
+    """Exécute le banc de charge et retourne le rapport de mesures (dict sérialisable)"""
+    workdir = workdir or tempfile.mkdtemp(prefix='mayfin_load_')
+    jobs = []
+    for i in range(requests):
+        input_path = os.path.join(workdir, f"dossier_{i}.json")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            json.dump(generate_dossier(seed + i), f, ensure_ascii=False)
+        jobs.append((input_path, os.path.join(workdir, f"rapport_{i}.pdf")))
+
+    if mode == 'cli':
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        task = _run_cli
+    else:
+        executor = ProcessPoolExecutor(max_workers=concurrency)
+        task = _run_inprocess
+        # Démarrage des workers hors mesure (imports ReportLab/NumPy)
+        list(executor.map(_warmup, range(concurrency)))
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    arrivals = arrival_times(requests, rate, seed)
+    futures = []
+    completed = {}
+    start = time.perf_counter()
+    for (input_path, output_path), arrival in zip(jobs, arrivals):
+        delay = start + arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        future = executor.submit(task, input_path, output_path)
+        future.add_done_callback(lambda f: completed.setdefault(f, time.perf_counter()))
+        futures.append((start + arrival, future))
+
+    results = []
+    for scheduled, future in futures:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'service_time': None, 'pid': None}
+        # Latence de bout en bout : arrivée prévue -> fin du rendu (attente incluse)
+        result['latency'] = completed.get(future, time.perf_counter()) - scheduled
+        results.append(result)
+    wall_time = time.perf_counter() - start
+    executor.shutdown()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    return _summarize(results, wall_time, usage_before, usage_after, requests, concurrency, rate, mode, seed)
+
+
+def _summarize(results, wall_time, usage_before, usage_after, requests, concurrency, rate, mode, seed):
+    """Agrège les mesures individuelles"""
+    ok = [r for r in results if r['success']]
+    latencies = [r['latency'] for r in ok if r.get('latency') is not None]
+    services = [r['service_time'] for r in ok if r.get('service_time') is not None]
+
+    # RSS max et CPU cumulés par worker (par PID)
+    workers = {}
+    for r in results:
+        if r.get('pid') is None or r.get('max_rss_kb') is None:
+            continue
+        worker = workers.setdefault(r['pid'], {'max_rss_kb': 0, 'cpu_time': 0.0, 'requests': 0})
+        worker['max_rss_kb'] = max(worker['max_rss_kb'], r['max_rss_kb'])
+        worker['requests'] += 1
+        if mode == 'cli':
+            worker['cpu_time'] += r['cpu_time']
+        else:
+            # En mode pool, ru_utime+ru_stime est cumulatif pour le worker
+            worker['cpu_time'] = max(worker['cpu_time'], r['cpu_time'])
+
+    cpu_workers = sum(w['cpu_time'] for w in workers.values())
+    cpu_driver = ((usage_after.ru_utime + usage_after.ru_stime)
+                  - (usage_before.ru_utime + usage_before.ru_stime))
+    cpu_total = cpu_workers + cpu_driver
+    rss_values = [w['max_rss_kb'] for w in workers.values()]
+
+    def stats(values):
+        return {
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': max(values) if values else None,
+            'mean': sum(values) / len(values) if values else None,
+        }
+
+    errors = [r['error'] for r in results if not r['success']]
+    return {
+        'config': {
+            'requests': requests,
+            'concurrency': concurrency,
+            'arrival_rate': rate,
+            'mode': mode,
+            'seed': seed,
+            'cpu_count': os.cpu_count(),
+        },
+        'wall_time_s': wall_time,
+        'throughput_rps': len(ok) / wall_time if wall_time else None,
+        'error_rate': len(errors) / len(results) if results else 0.0,
+        'errors_sample': errors[:5],
+        'latency_s': stats(latencies),
+        'service_time_s': stats(services),
+        'workers': len(workers),
+        'peak_rss_kb_per_worker': {
+            'max': max(rss_values) if rss_values else None,
+            'mean': sum(rss_values) / len(rss_values) if rss_values else None,
+        },
+        'cpu': {
+            'total_s': cpu_total,
+            'workers_s': cpu_workers,
+            'driver_s': cpu_driver,
+            'utilization': cpu_total / (wall_time * (os.cpu_count() or 1)) if wall_time else None,
+        },
+    }
+
+
+def main():
+    """Point d'entrée CLI"""
+    parser = argparse.ArgumentParser(description="Banc de charge du générateur de rapports MayFin")
+    parser.add_argument('--requests', type=int, default=100, help="nombre de rapports à générer")
+    parser.add_argument('--concurrency', type=int, default=8, help="nombre de workers simultanés")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="débit d'arrivée en demandes/s (0 = rafale simultanée)")
+    parser.add_argument('--mode', choices=['inprocess', 'cli'], default='inprocess',
+                        help="pool de processus Python ou sous-processus CLI")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', help="répertoire des dossiers et PDF générés")
+    parser.add_argument('--output', default='load_test_results.json', help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    report = run_load_test(args.requests, args.concurrency, args.rate, args.mode, args.seed, args.workdir)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    latency = report['latency_s']
+    print(f"📈 {args.requests} rapports, {args.concurrency} workers, mode {args.mode}")
+    print(f"   Débit        : {report['throughput_rps']:.2f} rapports/s")
+    if latency['p50'] is not None:
+        print(f"   Latence      : p50 {latency['p50']:.3f} s | p95 {latency['p95']:.3f} s | p99 {latency['p99']:.3f} s")
+    print(f"   Erreurs      : {report['error_rate'] * 100:.1f} %")
+    print(f"   RSS max      : {report['peak_rss_kb_per_worker']['max']} Ko par worker")
+    print(f"   CPU          : {report['cpu']['utilization'] * 100:.0f} % d'utilisation")
+    print(f"   Résultats    : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifeste des rapports rendus - MayFin
+Index SQLite local (un enregistrement par rapport) et planificateur de
+régénération : seuls les rapports touchés par une modification du gabarit
+(couleurs, seuils, mentions) sont rendus à nouveau
+
+Usage :
+    python render_manifest.py stats
+    python render_manifest.py plan --limit 20
+    python render_manifest.py rerender --workers 8 [--upload]
+"""
+
+from datetime import datetime
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+
+import numpy as np
+
+from financial_engine import to_float
+from generate_mayfin_report import PROFILES, TEMPLATE_IMPACT, render_items, template_components, template_version
+
+DEFAULT_MANIFEST_PATH = os.environ.get('MAYFIN_MANIFEST_PATH', 'render_manifest.sqlite')
+
+# Priorité de régénération par décision (dossiers actifs d'abord, 2 par défaut)
+DECISION_PRIORITY = {
+    'FAVORABLE': 0,
+    'ACCORD': 0,
+    'À ÉTUDIER': 1,
+    'À ÉTUDIER AVEC RÉSERVES': 1,
+}
+
+# Nombre d'inscriptions regroupées par transaction
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    storage TEXT NOT NULL,
+    report_id TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    template_components TEXT NOT NULL,
+    sections TEXT NOT NULL,
+    profile TEXT,
+    degradations TEXT NOT NULL,
+    decision TEXT,
+    score REAL,
+    pages INTEGER,
+    bytes INTEGER,
+    render_time REAL,
+    rendered_at TEXT NOT NULL,
+    input_data BLOB,
+    PRIMARY KEY (storage, report_id)
+);
+CREATE INDEX IF NOT EXISTS renders_template ON renders (template_version);
+CREATE INDEX IF NOT EXISTS renders_input ON renders (input_hash);
+"""
+
+
+def canonical_json(data):
+    """Sérialisation stable d'un dossier (clés triées) pour l'empreinte et l'archivage"""
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def input_hash(data):
+    """Empreinte SHA-256 d'un dossier"""
+    return hashlib.sha256(canonical_json(data)).hexdigest()
+
+
+class RenderManifest:
+    """
+    Index des rapports rendus : empreinte du dossier, version du gabarit,
+    sections, décision, score, pages, taille et durée de rendu.
+    Le dossier source est archivé compressé (`store_inputs`) pour permettre
+    la régénération sans relire l'export d'origine.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, store_inputs=True):
+        self.path = path
+        self.store_inputs = store_inputs
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._uncommitted = 0
+
+    def record(self, data, result):
+        """Inscrit (ou remplace) le rapport produit pour un dossier"""
+        render = result.get('render') or {}
+        if 'file' in result:
+            storage, report_id = 'file', os.path.abspath(result['file'])
+        else:
+            storage, report_id = result['bucket'], result['object']
+        components = template_components()
+        payload = canonical_json(data)
+        score = to_float(data.get('score'))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO renders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                storage,
+                report_id,
+                hashlib.sha256(payload).hexdigest(),
+                render.get('template_version') or template_version(components),
+                json.dumps(components, sort_keys=True),
+                ','.join(render.get('sections', {})),
+                render.get('profile'),
+                json.dumps(render.get('degradations', [])),
+                (data.get('recommendation') or {}).get('decision'),
+                float(score) if np.isfinite(score) else None,
+                render.get('pages'),
+                result.get('bytes'),
+                render.get('elapsed'),
+                datetime.now().isoformat(timespec='seconds'),
+                zlib.compress(payload) if self.store_inputs else None,
+            ),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        """Valide les inscriptions en attente"""
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def is_current(self, data, storage, report_id, sections=None):
+        """
+        Vrai si le rapport existe pour ce dossier à l'identique, avec le gabarit
+        actuel, sans dégradation et avec toutes les `sections` demandées
+        (celles du profil complet par défaut)
+        """
+        row = self.conn.execute(
+            "SELECT input_hash, template_version, sections, degradations FROM renders "
+            "WHERE storage = ? AND report_id = ?",
+            (storage, report_id),
+        ).fetchone()
+        if row is None:
+            return False
+        stored_hash, stored_version, stored_sections, degradations = row
+        sections = PROFILES['full'] if sections is None else sections
+        return (stored_hash == input_hash(data) and stored_version == template_version()
+                and degradations == '[]' and set(sections) <= set(stored_sections.split(',')))
+
+    def load_input(self, storage, report_id):
+        """Dossier source archivé d'un rapport, None s'il n'a pas été conservé"""
+        row = self.conn.execute(
+            "SELECT input_data FROM renders WHERE storage = ? AND report_id = ?",
+            (storage, report_id),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def _stale_components(self, stored, sections, current):
+        """Composants modifiés du gabarit affectant au moins une section rendue"""
+        reasons = []
+        for name, digest in current.items():
+            if stored.get(name) == digest:
+                continue
+            impact = TEMPLATE_IMPACT.get(name)
+            if impact is None or sections & set(impact):
+                reasons.append(name)
+        return reasons
+
+    def _stale_condition(self, current):
+        """Condition SQL (et paramètres) : un composant modifié touche une section rendue"""
+        clauses, params = [], []
+        for name, digest in current.items():
+            impact = TEMPLATE_IMPACT.get(name)
+            touched = " OR ".join(["instr(',' || sections || ',', ?) > 0"] * len(impact)) if impact else "1"
+            clauses.append(f"(json_extract(template_components, ?) IS NOT ? AND ({touched}))")
+            params += [f"$.{name}", digest] + [f",{section}," for section in impact or ()]
+        return " OR ".join(clauses), params
+
+    def plan(self, include_degraded=False, storage=None, limit=None):
+        """
+        Rapports à régénérer, par ordre de priorité (décision, puis rendus les
+        plus récents) : liste de dicts avec les composants en cause (`reasons`).
+        `include_degraded` ajoute les rapports rendus en mode allégé.
+        Sélection, tri et limite sont effectués par SQLite.
+        """
+        current = template_components()
+        stale, params = self._stale_condition(current)
+        condition = f"(template_version != ? AND ({stale}))"
+        params = [template_version(current)] + params
+        if include_degraded:
+            condition += " OR degradations != '[]'"
+        query = ("SELECT storage, report_id, template_components, sections, degradations, decision, "
+                 f"rendered_at, input_data IS NOT NULL FROM renders WHERE ({condition})")
+        if storage is not None:
+            query += " AND storage = ?"
+            params.append(storage)
+        priority = " ".join(["WHEN ? THEN ?"] * len(DECISION_PRIORITY))
+        query += f" ORDER BY CASE decision {priority} ELSE 2 END, rendered_at DESC"
+        for decision, rank in DECISION_PRIORITY.items():
+            params += [decision, rank]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        planned = []
+        for row in self.conn.execute(query, params):
+            row_storage, report_id, stored, sections, degradations, decision, rendered_at, has_input = row
+            reasons = self._stale_components(json.loads(stored), set(sections.split(',')), current)
+            if include_degraded and degradations != '[]':
+                reasons.append('degradations')
+            planned.append({
+                'storage': row_storage,
+                'report_id': report_id,
+                'reasons': reasons,
+                'decision': decision,
+                'rendered_at': rendered_at,
+                'has_input': bool(has_input),
+            })
+        return planned
+
+    def stats(self):
+        """Nombre de rapports par version du gabarit"""
+        rows = self.conn.execute(
+            "SELECT template_version, COUNT(*), SUM(bytes), AVG(render_time) FROM renders "
+            "GROUP BY template_version ORDER BY MAX(rendered_at) DESC"
+        ).fetchall()
+        return [{'template_version': version, 'reports': count, 'bytes': size, 'mean_render_time': mean}
+                for version, count, size, mean in rows]
+
+    def close(self):
+        """Valide et ferme l'index"""
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def rerender(manifest, workers=None, time_budget=None, sink=None, include_degraded=False, limit=None):
+    """
+    Régénère les rapports périmés dans l'ordre du plan, via le pool de rendu
+    (render_items). Sans `sink`, seuls les fichiers locaux sont traités ; avec
+    `sink`, les objets de son bucket. Le manifeste est mis à jour au fil des rendus.
+    """
+    storage = 'file' if sink is None else sink.bucket
+    planned = manifest.plan(include_degraded, storage, limit)
+    for item in planned:
+        if not item['has_input']:
+            yield {'success': False, 'error': f"{item['report_id']} : dossier source non archivé"}
+
+    def items():
+        for item in planned:
+            if not item['has_input']:
+                continue
+            if sink is None:
+                os.makedirs(os.path.dirname(item['report_id']), exist_ok=True)
+            yield manifest.load_input(storage, item['report_id']), item['report_id']
+
+    yield from render_items(items(), workers, time_budget=time_budget, sink=sink, manifest=manifest)
+    manifest.commit()
+
+
+def main():
+    """Point d'entrée CLI"""
+    parser = argparse.ArgumentParser(description="Manifeste et régénération sélective des rapports MayFin")
+    parser.add_argument('command', choices=['stats', 'plan', 'rerender'])
+    parser.add_argument('--db', default=DEFAULT_MANIFEST_PATH, help="fichier SQLite du manifeste")
+    parser.add_argument('--degraded', action='store_true', help="inclure les rapports rendus en mode allégé")
+    parser.add_argument('--limit', type=int, help="nombre maximal de rapports à régénérer")
+    parser.add_argument('--workers', type=int, help="nombre de workers de rendu")
+    parser.add_argument('--time-budget', type=float, help="budget de temps par rapport (secondes)")
+    parser.add_argument('--upload', action='store_true',
+                        help="régénérer les objets Supabase Storage (SUPABASE_URL) au lieu des fichiers locaux")
+    args = parser.parse_args()
+
+    with RenderManifest(args.db) as manifest:
+        if args.command == 'stats':
+            print(f"📚 Gabarit actuel : {template_version()}")
+            for entry in manifest.stats():
+                print(json.dumps(entry, ensure_ascii=False))
+        elif args.command == 'plan':
+            planned = manifest.plan(args.degraded, limit=args.limit)
+            reasons = {}
+            for item in planned:
+                for reason in item['reasons']:
+                    reasons[reason] = reasons.get(reason, 0) + 1
+            print(f"🗂️  {len(planned)} rapport(s) à régénérer : {json.dumps(reasons, ensure_ascii=False)}")
+            for item in planned:
+                print(json.dumps(item, ensure_ascii=False))
+        elif args.upload:
+            from storage_sink import StorageSink
+            with StorageSink() as sink:
+                for result in rerender(manifest, args.workers, args.time_budget, sink, args.degraded, args.limit):
+                    print(json.dumps(result), flush=True)
+        else:
+            for result in rerender(manifest, args.workers, args.time_budget, None, args.degraded, args.limit):
+                print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Envoi des rapports vers Supabase Storage - MayFin
+Upload depuis la mémoire avec connexions persistantes, envoi fractionné
+(protocole TUS) pour les gros classeurs, concurrence bornée et reprises
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+import base64
+import http.client
+import os
+import queue
+import random
+import threading
+import time
+
+# Seuil au-delà duquel l'envoi est fractionné (recommandation Supabase : 6 Mo)
+MULTIPART_THRESHOLD = 6 * 1024 * 1024
+
+# Taille des fragments TUS (Supabase impose 6 Mo)
+CHUNK_SIZE = 6 * 1024 * 1024
+
+DEFAULT_BUCKET = os.environ.get('MAYFIN_REPORTS_BUCKET', 'documents')
+
+# Codes HTTP donnant lieu à une nouvelle tentative
+RETRYABLE_STATUS = (408, 425, 429, 500, 502, 503, 504)
+
+
+class UploadError(Exception):
+    """Échec définitif d'un envoi"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _RetryableError(Exception):
+    """Échec transitoire (réseau, 5xx, 429)"""
+
+
+class ConnectionPool:
+    """Pool de connexions HTTP(S) persistantes (keep-alive) vers un même hôte"""
+
+    def __init__(self, base_url, size=4, timeout=60):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """Exécute une requête et retourne (statut, en-têtes, corps) ; la connexion est réutilisée"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._new_connection()
+        try:
+            conn.request(method, self.base_path + path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            payload = response.read()
+            status, response_headers = response.status, dict(response.getheaders())
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise _RetryableError(f"{method} {path} : {e}") from e
+
+        if response.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return status, response_headers, payload
+
+    def close(self):
+        """Ferme les connexions inactives"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class StorageSink:
+    """
+    Étape de sortie : envoie des PDF rendus en mémoire vers Supabase Storage.
+    Les envois sont exécutés en arrière-plan par `max_workers` threads, avec
+    au plus `max_pending` envois en attente (submit bloque au-delà), ce qui
+    permet de recouvrir rendu et envoi sans accumuler les PDF en mémoire.
+    """
+
+    def __init__(self, base_url=None, api_key=None, bucket=DEFAULT_BUCKET, max_workers=4,
+                 max_pending=None, max_retries=5, backoff=0.5, upsert=True,
+                 multipart_threshold=MULTIPART_THRESHOLD, chunk_size=CHUNK_SIZE):
+        base_url = base_url or os.environ.get('SUPABASE_URL')
+        if not base_url:
+            raise ValueError("URL Supabase manquante (paramètre base_url ou SUPABASE_URL)")
+        self.api_key = api_key or os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.upsert = upsert
+        self.multipart_threshold = multipart_threshold
+        self.chunk_size = chunk_size
+        self.pool = ConnectionPool(base_url, size=max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mayfin-upload')
+        self._slots = threading.BoundedSemaphore(max_pending or max_workers * 2)
+
+    def _headers(self, extra=None):
+        headers = {
+            'Authorization': f"Bearer {self.api_key}",
+            'apikey': self.api_key,
+        }
+        headers.update(extra or {})
+        return headers
+
+    def _retry(self, operation, description):
+        """Exécute une opération avec reprises et attente exponentielle (avec gigue)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except _RetryableError as e:
+                if attempt == self.max_retries:
+                    raise UploadError(f"{description} : échec après {attempt + 1} tentatives ({e})") from e
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _check(self, status, payload, description, expected=(200, 201, 204)):
+        if status in expected:
+            return
+        message = f"{description} : HTTP {status} {payload[:200].decode('utf-8', 'replace')}"
+        if status in RETRYABLE_STATUS:
+            raise _RetryableError(message)
+        raise UploadError(message, status)
+
+    def _object_path(self, object_path):
+        return f"/storage/v1/object/{quote(self.bucket)}/{quote(object_path)}"
+
+    def _stored_size(self, object_path):
+        """Taille de l'objet déjà présent dans le bucket, None s'il est absent"""
+        status, headers, payload = self.pool.request('HEAD', self._object_path(object_path), headers=self._headers())
+        if status == 404:
+            return None
+        self._check(status, payload, f"Vérification de {object_path}", expected=(200,))
+        return int(headers.get('Content-Length') or headers.get('content-length') or -1)
+
+    def _upload_simple(self, data, object_path, content_type):
+        """Envoi en une requête"""
+        attempts = []
+
+        def send():
+            attempts.append(None)
+            status, _, payload = self.pool.request('POST', self._object_path(object_path), body=data, headers=self._headers({
+                'Content-Type': content_type,
+                'Content-Length': str(len(data)),
+                'x-upsert': 'true' if self.upsert else 'false',
+            }))
+            # Sans upsert, un 409 après une tentative sans réponse peut venir de
+            # cette tentative elle-même : l'objet est vérifié
+            if status == 409 and len(attempts) > 1 and self._stored_size(object_path) == len(data):
+                return
+            self._check(status, payload, f"Envoi de {object_path}")
+        self._retry(send, f"Envoi de {object_path}")
+
+    def _upload_resumable(self, data, object_path, content_type):
+        """Envoi fractionné et reprenable (protocole TUS de Supabase Storage)"""
+        def encode(value):
+            return base64.b64encode(value.encode('utf-8')).decode('ascii')
+
+        metadata = ",".join([
+            f"bucketName {encode(self.bucket)}",
+            f"objectName {encode(object_path)}",
+            f"contentType {encode(content_type)}",
+        ])
+
+        def create():
+            status, headers, payload = self.pool.request('POST', '/storage/v1/upload/resumable', headers=self._headers({
+                'Tus-Resumable': '1.0.0',
+                'Upload-Length': str(len(data)),
+                'Upload-Metadata': metadata,
+                'x-upsert': 'true' if self.upsert else 'false',
+                'Content-Length': '0',
+            }))
+            self._check(status, payload, f"Création de l'envoi {object_path}", expected=(201,))
+            location = headers.get('Location') or headers.get('location')
+            if not location:
+                raise UploadError(f"Création de l'envoi {object_path} : en-tête Location absent")
+            path = urlsplit(location).path
+            return path[len(self.pool.base_path):] if path.startswith(self.pool.base_path) else path
+
+        upload_path = self._retry(create, f"Création de l'envoi {object_path}")
+
+        def current_offset():
+            status, headers, payload = self.pool.request('HEAD', upload_path, headers=self._headers({
+                'Tus-Resumable': '1.0.0',
+            }))
+            self._check(status, payload, f"Reprise de {object_path}", expected=(200, 204))
+            return int(headers.get('Upload-Offset') or headers.get('upload-offset') or 0)
+
+        offset = 0
+        while offset < len(data):
+            chunk = data[offset:offset + self.chunk_size]
+
+            def send(offset=offset, chunk=chunk):
+                # Après un échec, le serveur peut avoir reçu une partie du fragment
+                status, headers, payload = self.pool.request('PATCH', upload_path, body=chunk, headers=self._headers({
+                    'Tus-Resumable': '1.0.0',
+                    'Upload-Offset': str(offset),
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Content-Length': str(len(chunk)),
+                }))
+                if status == 409:
+                    return current_offset()
+                self._check(status, payload, f"Envoi de {object_path} (octet {offset})", expected=(200, 204))
+                return int(headers.get('Upload-Offset') or headers.get('upload-offset') or offset + len(chunk))
+
+            offset = self._retry(send, f"Envoi de {object_path} (octet {offset})")
+
+    def upload(self, data, object_path, content_type='application/pdf'):
+        """Envoie des octets de façon synchrone et retourne le résultat"""
+        start = time.perf_counter()
+        if len(data) > self.multipart_threshold:
+            self._upload_resumable(data, object_path, content_type)
+        else:
+            self._upload_simple(data, object_path, content_type)
+        return {
+            'success': True,
+            'bucket': self.bucket,
+            'object': object_path,
+            'bytes': len(data),
+            'upload_time': round(time.perf_counter() - start, 4),
+        }
+
+    def _upload_task(self, data, object_path, content_type):
+        try:
+            return self.upload(data, object_path, content_type)
+        except Exception as e:
+            return {'success': False, 'bucket': self.bucket, 'object': object_path, 'error': str(e)}
+        finally:
+            self._slots.release()
+
+    def submit(self, data, object_path, content_type='application/pdf'):
+        """Met un envoi en file (bloque si trop d'envois sont en attente) et retourne un futur"""
+        self._slots.acquire()
+        try:
+            return self._executor.submit(self._upload_task, data, object_path, content_type)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def close(self):
+        """Attend la fin des envois et ferme les connexions"""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur local simulant Supabase Storage - MayFin
+Implémente l'envoi simple d'objets et l'envoi reprenable TUS, avec injection
+de pannes (503, réponses perdues), pour tester l'étape d'envoi sans accès réseau
+
+Usage :
+    python storage_standin.py --port 54321 --fail-rate 0.1
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import argparse
+import base64
+import json
+import random
+import threading
+import uuid
+
+OBJECT_PREFIX = '/storage/v1/object/'
+RESUMABLE_PATH = '/storage/v1/upload/resumable'
+
+
+class StandInStorage:
+    """Stockage en mémoire et serveur HTTP/1.1 (keep-alive) exécuté dans un thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, fail_rate=0.0, seed=None):
+        self.objects = {}
+        self.uploads = {}
+        self.connections = set()
+        self.requests = 0
+        self.failures = 0
+        self.fail_rate = fail_rate
+        # Nombre d'envois simples enregistrés dont la réponse sera perdue
+        self.lost_responses = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                self.failures += 1
+                return True
+        return False
+
+    def _handler_class(self):
+        storage = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def _start(self):
+                with storage._lock:
+                    storage.connections.add(self.client_address)
+                body = self._body()
+                if storage._should_fail():
+                    self._reply(503, '{"error": "indisponible (panne simulée)"}'.encode('utf-8'))
+                    return None
+                return body
+
+            def do_POST(self):
+                body = self._start()
+                if body is None:
+                    return
+                if self.path.startswith(OBJECT_PREFIX):
+                    key = unquote(self.path[len(OBJECT_PREFIX):])
+                    with storage._lock:
+                        exists = key in storage.objects
+                        if exists and self.headers.get('x-upsert') != 'true':
+                            self._reply(409, b'{"error": "Duplicate"}')
+                            return
+                        storage.objects[key] = body
+                        lost = storage.lost_responses > 0
+                        if lost:
+                            storage.lost_responses -= 1
+                    if lost:
+                        self.close_connection = True
+                        return
+                    self._reply(200, json.dumps({'Key': key}).encode('utf-8'),
+                                {'Content-Type': 'application/json'})
+                elif self.path == RESUMABLE_PATH:
+                    metadata = {}
+                    for item in self.headers.get('Upload-Metadata', '').split(','):
+                        if ' ' in item:
+                            name, value = item.strip().split(' ', 1)
+                            metadata[name] = base64.b64decode(value).decode('utf-8')
+                    upload_id = uuid.uuid4().hex
+                    with storage._lock:
+                        storage.uploads[upload_id] = {
+                            'key': f"{metadata.get('bucketName')}/{metadata.get('objectName')}",
+                            'length': int(self.headers.get('Upload-Length', 0)),
+                            'data': bytearray(),
+                        }
+                    self._reply(201, headers={
+                        'Location': f"{storage.url}{RESUMABLE_PATH}/{upload_id}",
+                        'Tus-Resumable': '1.0.0',
+                    })
+                else:
+                    self._reply(404)
+
+            def do_PATCH(self):
+                body = self._start()
+                if body is None:
+                    return
+                upload = storage.uploads.get(self.path.rsplit('/', 1)[-1])
+                if upload is None:
+                    self._reply(404)
+                    return
+                with storage._lock:
+                    if int(self.headers.get('Upload-Offset', -1)) != len(upload['data']):
+                        self._reply(409, headers={'Upload-Offset': str(len(upload['data']))})
+                        return
+                    upload['data'] += body
+                    if len(upload['data']) >= upload['length']:
+                        storage.objects[upload['key']] = bytes(upload['data'])
+                    offset = len(upload['data'])
+                self._reply(204, headers={'Upload-Offset': str(offset), 'Tus-Resumable': '1.0.0'})
+
+            def do_HEAD(self):
+                if self.path.startswith(OBJECT_PREFIX):
+                    data = storage.objects.get(unquote(self.path[len(OBJECT_PREFIX):]))
+                    if data is None:
+                        self._reply(404)
+                    else:
+                        self._reply(200, data, {'Content-Type': 'application/pdf'})
+                    return
+                upload = storage.uploads.get(self.path.rsplit('/', 1)[-1])
+                if upload is None:
+                    self._reply(404)
+                    return
+                self._reply(200, headers={
+                    'Upload-Offset': str(len(upload['data'])),
+                    'Upload-Length': str(upload['length']),
+                    'Tus-Resumable': '1.0.0',
+                })
+
+            def do_GET(self):
+                key = unquote(self.path[len(OBJECT_PREFIX):]) if self.path.startswith(OBJECT_PREFIX) else None
+                data = storage.objects.get(key)
+                if data is None:
+                    self._reply(404)
+                else:
+                    self._reply(200, data, {'Content-Type': 'application/pdf'})
+
+        return Handler
+
+    def start(self):
+        """Démarre le serveur en arrière-plan"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le serveur"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """Point d'entrée CLI"""
+    parser = argparse.ArgumentParser(description="Serveur local simulant Supabase Storage")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="part des requêtes en échec 503")
+    args = parser.parse_args()
+
+    storage = StandInStorage(args.host, args.port, args.fail_rate)
+    print(f"🗄️  Stockage simulé sur {storage.url} (SUPABASE_URL={storage.url})")
+    try:
+        storage.server.serve_forever()
+    except KeyboardInterrupt:
+        storage.stop()
+
+
+if __name__ == "__main__":
+    main()
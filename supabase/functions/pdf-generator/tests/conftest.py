@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Configuration pytest : les modules du générateur sont importés depuis le répertoire parent"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
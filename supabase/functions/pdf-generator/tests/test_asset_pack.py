@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Tests du pack d'assets partagé"""
+
+import json
+
+import pytest
+from PIL import Image as PILImage
+
+from asset_pack import build_asset_pack
+from image_pipeline import (
+    PACK_ALIGNMENT, PACK_HEADER, PACK_MAGIC, PACK_VERSION, AssetPack, ImagePipeline, open_asset_pack, pack_align,
+)
+
+
+def _image(tmp_path, name, mode, color):
+    path = tmp_path / name
+    PILImage.new(mode, (400, 200), color).save(path, format='PNG')
+    return str(path)
+
+
+@pytest.fixture
+def sources(tmp_path):
+    return [_image(tmp_path, "logo.png", 'RGBA', (0, 128, 0, 128)), _image(tmp_path, "apercu.png", 'RGB', 'white')]
+
+
+def test_pack_round_trip(tmp_path, sources):
+    """Les images préparées sont relues du pack à l'identique, à des positions alignées"""
+    path = str(tmp_path / "assets.pack")
+    entries = [(sources[0], 100, 50), (sources[1], 200, 100)]
+    assert build_asset_pack(path, entries) == 2
+
+    expected = ImagePipeline()
+    pack = AssetPack(path)
+    assert len(pack) == 2
+    for source, width, height in entries:
+        prepared = expected.get(source, width, height)
+        packed = pack.get(prepared.key)
+        assert bytes(packed.data) == prepared.data
+        assert packed.pixel_size == prepared.pixel_size
+        assert packed.is_jpeg == prepared.is_jpeg
+    assert [packed.is_jpeg for packed in pack._images.values()] == [False, True]
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    index_size = PACK_HEADER.unpack_from(content)[2]
+    index = json.loads(content[PACK_HEADER.size:PACK_HEADER.size + index_size])
+    data_start = pack_align(PACK_HEADER.size + index_size)
+    for entry in index['images']:
+        assert (data_start + entry['offset']) % PACK_ALIGNMENT == 0
+    assert not (tmp_path / "assets.pack.tmp").exists()
+
+
+def test_pack_rejects_bad_header(tmp_path, sources):
+    """Signature ou version inconnue : le pack est refusé, et ignoré par open_asset_pack"""
+    path = tmp_path / "assets.pack"
+    build_asset_pack(str(path), [(sources[0], 100, 50)])
+    content = path.read_bytes()
+    index_size = PACK_HEADER.unpack_from(content)[2]
+
+    for header in (PACK_HEADER.pack(b'NOTAPACK', PACK_VERSION, index_size),
+                   PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION + 1, index_size)):
+        path.write_bytes(header + content[PACK_HEADER.size:])
+        with pytest.raises(ValueError):
+            AssetPack(str(path))
+        assert open_asset_pack(str(path)) is None
+    assert open_asset_pack(str(tmp_path / "absent.pack")) is None
+    assert open_asset_pack(None) is None
+
+
+def test_pipeline_prefers_pack(tmp_path, sources):
+    """Une image présente dans le pack est servie sans décodage ni mise en cache"""
+    path = str(tmp_path / "assets.pack")
+    build_asset_pack(path, [(sources[0], 100, 50)])
+    pipeline = ImagePipeline(pack=AssetPack(path))
+
+    first = pipeline.get(sources[0], 100, 50)
+    second = pipeline.get(sources[0], 100, 50)
+    other_size = pipeline.get(sources[0], 200, 100)
+
+    assert second is first
+    assert pipeline.pack_hits == 2
+    assert (pipeline.hits, pipeline.misses) == (0, 1)
+    assert other_size.key != first.key
+    assert list(pipeline._cache) == [other_size.key]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Tests du moteur de financement et du stress-test"""
+
+import numpy as np
+import pytest
+
+from financial_engine import (
+    CHOCS_CA, CHOCS_CHARGES_VAR, CHOCS_DUREE, CHOCS_TAUX,
+    compute_financing, compute_mensualite, compute_schedule, compute_stress_grid,
+)
+from generate_mayfin_report import get_sample_data
+
+
+def test_mensualite_known_annuities():
+    """Mensualités de référence (tables d'annuités)"""
+    mensualite = compute_mensualite([100000, 200000, 200000], [5.0, 3.6, 6.0], [120, 240, 360])
+    assert mensualite == pytest.approx([1060.66, 1170.22, 1199.10], abs=0.01)
+
+
+def test_mensualite_zero_rate_and_missing_inputs():
+    """Taux nul : remboursement linéaire ; entrée manquante ou durée nulle : NaN"""
+    mensualite = compute_mensualite([12000, 12000, np.nan, 12000], [0.0, np.nan, 5.0, 5.0], [12, 12, 12, 0])
+    assert mensualite[0] == pytest.approx(1000.0)
+    assert np.isnan(mensualite[1:]).all()
+
+
+def test_schedule_amortizes_capital():
+    """L'échéancier rembourse exactement le capital, intérêts du premier mois au taux mensuel"""
+    schedule = compute_schedule([100000, 12000, 50000], [5.0, 0.0, np.nan], [120, 12, 60])
+
+    assert schedule['interets'].shape == (3, 120)
+    assert schedule['interets'][0, 0] == pytest.approx(100000 * 0.05 / 12)
+    assert schedule['capital'][0].sum() == pytest.approx(100000)
+    assert schedule['restant_du'][0, 119] == pytest.approx(0, abs=1e-6)
+    assert (schedule['interets'][0] + schedule['capital'][0]) == pytest.approx(np.full(120, 1060.655), abs=0.01)
+    # Taux nul : 12 échéances de 1 000, aucun intérêt
+    assert schedule['capital'][1, :12] == pytest.approx(np.full(12, 1000.0))
+    assert schedule['interets'][1].sum() == 0
+    assert not schedule['actif'][1, 12:].any()
+    # Taux manquant : aucun échéancier
+    assert not schedule['actif'][2].any()
+
+
+@pytest.mark.parametrize('duree', ["inf", 1e300, 1e8, -12, 0, "abc"])
+def test_invalid_duration_is_isolated(duree):
+    """Une durée invalide n'affecte que son dossier et ne dimensionne pas l'échéancier"""
+    valide = get_sample_data()
+    invalide = dict(get_sample_data(), duree_mois=duree)
+    financing = compute_financing([valide, invalide])
+
+    assert financing.schedule['interets'].shape[1] == valide['duree_mois']
+    assert np.isfinite(financing.dossier(0)['mensualite'])
+    assert np.isnan(financing.dossier(1)['mensualite'])
+
+
+def test_stress_grid_shape_and_base_cell():
+    """La grille couvre tous les chocs et sa cellule sans choc égale le DSCR non stressé"""
+    data = get_sample_data()
+    grid = compute_stress_grid(data)
+
+    assert grid.dscr.shape == (len(CHOCS_CA), len(CHOCS_CHARGES_VAR), len(CHOCS_TAUX), len(CHOCS_DUREE), 3)
+    assert grid.rnet.shape == grid.dscr.shape
+    assert grid.size == len(CHOCS_CA) * len(CHOCS_CHARGES_VAR) * len(CHOCS_TAUX) * len(CHOCS_DUREE)
+    assert grid.duree == data['duree_mois']
+
+    base = grid.dscr[grid.index_of(grid.chocs_ca, 0), grid.index_of(grid.chocs_charges_var, 0),
+                     grid.index_of(grid.chocs_taux, 0), grid.index_of(grid.durees, grid.duree)]
+    assert base == pytest.approx(compute_financing([data]).dossier(0)['dscr'])
+
+    rnet_base = grid.rnet[grid.index_of(grid.chocs_ca, 0), grid.index_of(grid.chocs_charges_var, 0),
+                          grid.index_of(grid.chocs_taux, 0), grid.index_of(grid.durees, grid.duree)]
+    assert rnet_base == pytest.approx([data['previsionnels'][a]['rnet'] for a in ('annee1', 'annee2', 'annee3')])
+
+
+def test_stress_grid_lists_missing_year_one_inputs():
+    """Les entrées de l'année 1 absentes sont signalées, les autres non"""
+    data = get_sample_data()
+    assert compute_stress_grid(data).missing == []
+
+    data['taux_interet'] = None
+    del data['previsionnels']['annee1']['ca']
+    assert compute_stress_grid(data).missing == ['taux_interet', 'ca']
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Tests du rendu en lot et en flux"""
+
+import gzip
+import json
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import generate_mayfin_report
+from financial_engine import CHOCS_CA, compute_financing
+from load_test import generate_dossier
+
+
+def _write_ndjson(path, dossiers):
+    with open(path, 'w', encoding='utf-8') as f:
+        for data in dossiers:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+
+def test_stream_isolates_financing_failure(tmp_path, monkeypatch):
+    """Un dossier faisant échouer le calcul du lot n'interrompt pas le flux"""
+    dossiers = [dict(generate_dossier(i), id=f"D{i}") for i in range(3)]
+    dossiers[1]['duree_mois'] = "inf"
+    input_path = tmp_path / "dossiers.ndjson"
+    _write_ndjson(input_path, dossiers)
+
+    def fragile_financing(batch):
+        if any(data.get('duree_mois') == "inf" for data in batch):
+            raise OverflowError("cannot convert float infinity to integer")
+        return compute_financing(batch)
+
+    monkeypatch.setattr(generate_mayfin_report, 'compute_financing', fragile_financing)
+    results = list(generate_mayfin_report.generate_reports_from_stream(
+        str(input_path), str(tmp_path / "out"), workers=2))
+
+    assert len(results) == 3
+    failed = [r for r in results if not r['success']]
+    assert len(failed) == 1
+    assert "infinity" in failed[0]['error']
+    assert failed[0]['file'].endswith("rapport_D1.pdf")
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["rapport_D0.pdf", "rapport_D2.pdf"]
+
+
+def test_stream_renders_invalid_duration(tmp_path):
+    """Une durée invalide retombe sur les valeurs fournies sans bloquer le lot"""
+    dossiers = [dict(generate_dossier(i), id=f"D{i}") for i in range(2)]
+    dossiers[0]['duree_mois'] = "inf"
+    input_path = tmp_path / "dossiers.ndjson"
+    _write_ndjson(input_path, dossiers)
+
+    results = list(generate_mayfin_report.generate_reports_from_stream(
+        str(input_path), str(tmp_path / "out"), workers=2))
+
+    assert [r['success'] for r in results] == [True, True]
+
+
+def test_stream_reports_corrupt_line(tmp_path):
+    """Une ligne corrompue au milieu d'un export gzip donne un échec et le flux se poursuit"""
+    input_path = tmp_path / "dossiers.ndjson.gz"
+    with gzip.open(input_path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(dict(generate_dossier(0), id="D0")) + "\n")
+        f.write('{"id": "D1", "entreprise": \n')
+        f.write(json.dumps(dict(generate_dossier(2), id="D2")) + "\n")
+
+    results = list(generate_mayfin_report.generate_reports_from_stream(
+        str(input_path), str(tmp_path / "out"), workers=2))
+
+    assert len(results) == 3
+    failed = [r for r in results if not r['success']]
+    assert len(failed) == 1
+    assert failed[0]['error'].startswith("Dossier n°1 : ligne 2 : ")
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["rapport_D0.pdf", "rapport_D2.pdf"]
+
+
+def test_collect_reports_broken_worker():
+    """Un worker interrompu donne un résultat en échec au lieu d'arrêter la collecte"""
+    broken = Future()
+    broken.set_exception(BrokenProcessPool("worker interrompu"))
+    rendered = Future()
+    rendered.set_result({'success': True, 'file': "rapport_B.pdf"})
+    pending = {broken: ({'id': 'A'}, "rapport_A.pdf"), rendered: ({'id': 'B'}, "rapport_B.pdf")}
+
+    results = list(generate_mayfin_report._collect([broken, rendered], pending, {}, None, None))
+
+    assert results == [
+        {'success': False, 'file': "rapport_A.pdf", 'error': "worker interrompu"},
+        {'success': True, 'file': "rapport_B.pdf"},
+    ]
+    assert not pending
+
+
+def test_build_accepts_string_loan_terms():
+    """Taux et durée saisis en texte ("5,5", "84") sont acceptés par le stress-test"""
+    data = generate_mayfin_report.get_sample_data()
+    data['taux_interet'] = "5,5"
+    data['duree_mois'] = "84"
+
+    pdf, render_info = generate_mayfin_report.render_to_bytes(data)
+
+    assert pdf.startswith(b'%PDF')
+    assert 'stress_test' in render_info['sections']
+
+
+def test_degradation_reuses_stress_grid(tmp_path, monkeypatch):
+    """La reconstruction du stress-test en mode dégradé ne recalcule pas la grille"""
+    calls = []
+    compute = generate_mayfin_report.compute_stress_grid
+
+    def counting_grid(data):
+        calls.append(data)
+        return compute(data)
+
+    monkeypatch.setattr(generate_mayfin_report, 'compute_stress_grid', counting_grid)
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "rapport.pdf"), time_budget=0.0)
+    generator.build(generate_mayfin_report.get_sample_data())
+
+    assert 'images' in generator.render_info['degradations']
+    assert len(calls) == 1
+
+
+def _build_story(tmp_path, data, **build_options):
+    """Construit un rapport et retourne ses flowables, capturés avant la mise en page"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "rapport.pdf"))
+    flowables = []
+    build = generator.doc.build
+
+    def capture(story, **options):
+        flowables.extend(story)
+        return build(story, **options)
+
+    generator.doc.build = capture
+    generator.build(data, **build_options)
+    return flowables
+
+
+def _build_rows(tmp_path, data, **build_options):
+    """Construit un rapport et retourne les lignes (textes bruts) de ses tableaux"""
+    return [[cell if isinstance(cell, str) else getattr(cell, 'text', '') for cell in row]
+            for flowable in _build_story(tmp_path, data, **build_options)
+            if isinstance(flowable, generate_mayfin_report.Table)
+            for row in flowable._cellvalues]
+
+
+def test_ratios_table_shows_equity_ratio(tmp_path):
+    """Le ratio de fonds propres calculé (apport / total des besoins) figure dans les ratios clés"""
+    rows = _build_rows(tmp_path, generate_mayfin_report.get_sample_data(), sections=['financial'])
+
+    row = next(row for row in rows if row[0] == "Ratio de fonds propres")
+    assert row[1:] == ["15,96 %", "> 20%", "⚠ À améliorer"]
+
+
+def test_formatters_render_missing_values_as_dash():
+    """Les valeurs non finies sont affichées « - »"""
+    assert generate_mayfin_report.format_ratio(float('nan')) == "-"
+    assert generate_mayfin_report.format_number(float('nan')) == "-"
+    assert generate_mayfin_report.format_percentage(float('inf')) == "-"
+
+
+def test_stress_test_names_missing_inputs(tmp_path):
+    """Sans prévisionnels, le stress-test indique les entrées manquantes"""
+    data = generate_mayfin_report.get_sample_data()
+    del data['previsionnels']
+
+    story = _build_story(tmp_path, data, sections=['stress_test'])
+
+    texts = [flowable.text for flowable in story if isinstance(flowable, generate_mayfin_report.Paragraph)]
+    assert ("Stress-test non réalisé : données manquantes ou invalides (chiffre d'affaires année 1, "
+            "charges variables année 1, EBE année 1, résultat net année 1).") in texts
+
+
+def test_stress_test_shows_dash_for_missing_net_income(tmp_path):
+    """Un résultat net absent laisse les autres tableaux et affiche « - » dans le sien"""
+    data = generate_mayfin_report.get_sample_data()
+    del data['previsionnels']['annee1']['rnet']
+
+    rows = _build_rows(tmp_path, data, sections=['stress_test'])
+
+    dscr_taux, dscr_duree, rnet = (rows[i + 1:i + 1 + len(CHOCS_CA)] for i, row in enumerate(rows) if row[0] == '')
+    assert all(cell != "-" for row in dscr_taux + dscr_duree for cell in row[1:])
+    assert all(cell == "-" for row in rnet for cell in row[1:])
+
+
+def test_build_renders_selected_sections(tmp_path):
+    """Seules les sections demandées sont rendues, dans l'ordre du rapport"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "partiel.pdf"))
+    generator.build(generate_mayfin_report.get_sample_data(), sections=['financial', 'cover'])
+
+    assert list(generator.render_info['sections']) == ['cover', 'financial']
+
+
+def test_build_accepts_single_section_name(tmp_path):
+    """Un nom de section seul n'est pas découpé en caractères"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "couverture.pdf"))
+    generator.build(generate_mayfin_report.get_sample_data(), sections='cover')
+
+    assert list(generator.render_info['sections']) == ['cover']
+
+
+def test_build_rejects_unknown_section_and_profile(tmp_path):
+    """Sections et profils inconnus sont refusés"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "rapport.pdf"))
+    with pytest.raises(ValueError, match="Sections inconnues : annexe"):
+        generator.build(generate_mayfin_report.get_sample_data(), sections=['cover', 'annexe'])
+    with pytest.raises(ValueError, match="Profil inconnu"):
+        generator.build(generate_mayfin_report.get_sample_data(), profile='court')
+
+
+def test_preview_profile(tmp_path):
+    """Le profil 'preview' ne rend que la couverture et la synthèse"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "apercu.pdf"))
+    generator.build(generate_mayfin_report.get_sample_data(), profile='preview')
+
+    assert generator.render_info['profile'] == 'preview'
+    assert list(generator.render_info['sections']) == ['cover', 'summary']
+    assert generator.render_info['pages'] < 5
+
+
+def test_generate_preview_queues_full_report(tmp_path):
+    """L'aperçu est rendu aussitôt et le rapport complet par le futur retourné"""
+    preview_path = str(tmp_path / "apercu.pdf")
+    full_path = str(tmp_path / "rapport.pdf")
+
+    result, future = generate_mayfin_report.generate_preview(
+        generate_mayfin_report.get_sample_data(), preview_path, full_path=full_path)
+
+    assert result == {'success': True, 'file': preview_path}
+    full = future.result(timeout=60)
+    assert full['success'] and full['file'] == full_path
+    assert os.path.getsize(full_path) > os.path.getsize(preview_path)
+
+
+def test_degradation_note_labels_uncompressed_streams(tmp_path):
+    """La dernière dégradation est annoncée comme des flux non compressés"""
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "rapport.pdf"), time_budget=0.0)
+    generator.build(generate_mayfin_report.get_sample_data())
+
+    assert generator.render_info['degradations'] == ['images', 'appendix', 'compression']
+    assert generator.doc.pageCompression == 0
+    assert generator.doc.subject.endswith("flux de pages non compressés.")
+
+
+def test_layout_calibration_is_shared_module_state(tmp_path, monkeypatch):
+    """Le coût de mise en page est recalibré sur l'objet du module, pas sur la classe"""
+    calibration = generate_mayfin_report.LayoutCalibration()
+    monkeypatch.setattr(generate_mayfin_report, 'LAYOUT_CALIBRATION', calibration)
+    generator = generate_mayfin_report.MayFinReportGenerator(filename=str(tmp_path / "rapport.pdf"))
+    generator.build(generate_mayfin_report.get_sample_data(), profile='preview')
+
+    assert calibration.rate != generate_mayfin_report.DEFAULT_LAYOUT_RATE
+    assert not hasattr(generate_mayfin_report.MayFinReportGenerator, 'layout_rate')
+    calibration = generate_mayfin_report.LayoutCalibration(rate=1.0)
+    calibration.update(2.0)
+    assert calibration.rate == pytest.approx(1.3)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests du pipeline d'images"""
+
+import re
+from io import BytesIO
+
+from PIL import Image as PILImage
+
+import generate_mayfin_report
+import image_pipeline
+from image_pipeline import ImagePipeline
+
+
+def _png(color, size=(400, 200), mode='RGB'):
+    out = BytesIO()
+    PILImage.new(mode, size, color).save(out, format='PNG')
+    return out.getvalue()
+
+
+def test_cache_hit_returns_prepared_image():
+    """Une même source n'est décodée qu'une fois, puis servie par le cache"""
+    pipeline = ImagePipeline()
+    first = pipeline.get(_png('red'), 100, 50)
+    second = pipeline.get(_png('red'), 100, 50)
+
+    assert second is first
+    assert (pipeline.hits, pipeline.misses) == (1, 1)
+    assert first.is_jpeg and first.pixel_size == (208, 104)
+
+
+def test_cache_evicts_under_memory_budget():
+    """Au-delà de max_bytes, les images les moins récemment utilisées sont évincées"""
+    pipeline = ImagePipeline(max_bytes=1)
+    sources = [_png(color) for color in ('red', 'green', 'blue')]
+    for source in sources:
+        pipeline.get(source, 100, 50)
+
+    assert len(pipeline._cache) == 1
+    pipeline.get(sources[0], 100, 50)
+    assert (pipeline.hits, pipeline.misses) == (0, 4)
+
+
+def test_file_digests_are_bounded(tmp_path, monkeypatch):
+    """Les empreintes de fichiers mémorisées sont plafonnées"""
+    monkeypatch.setattr(image_pipeline, 'DIGEST_CACHE_ENTRIES', 2)
+    pipeline = ImagePipeline()
+    for i, color in enumerate(('red', 'green', 'blue')):
+        path = tmp_path / f"logo{i}.png"
+        path.write_bytes(_png(color))
+        pipeline.get(str(path), 100, 50)
+
+    assert [stamp[0] for stamp in pipeline._digests] == [str(tmp_path / "logo1.png"), str(tmp_path / "logo2.png")]
+
+
+def test_alpha_reader_is_reused():
+    """Le lecteur d'une image transparente garde ses plans décodés d'un PDF à l'autre"""
+    prepared = ImagePipeline().get(_png((0, 0, 0, 0), mode='RGBA'), 100, 50)
+
+    assert not prepared.is_jpeg
+    assert prepared.reader() is prepared.reader()
+    assert prepared.reader()._dataA is not None
+
+
+def test_logo_embedded_once_per_pdf():
+    """Le logo figure sur chaque page via une seule image (et son masque) dans le PDF"""
+    pdf, render_info = generate_mayfin_report.render_to_bytes(generate_mayfin_report.get_sample_data())
+
+    pages = re.findall(rb'<<\n/Contents .*?/Type /Page\n', pdf, re.S)
+    assert len(pages) == render_info['pages'] > 1
+    assert all(b'/FormXob.form_img_' in page for page in pages)
+    assert pdf.count(b'/Subtype /Image') == 2
+    assert pdf.count(b'/SMask') == 1
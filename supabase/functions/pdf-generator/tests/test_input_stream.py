@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Tests de la lecture en flux des dossiers"""
+
+import gc
+import gzip
+import json
+import warnings
+
+from input_stream import RecordError, detect_format, iter_chunks, iter_records, load_json
+
+
+def test_iter_records_gzip_ndjson(tmp_path):
+    """NDJSON compressé gzip : un dossier par ligne, lignes vides ignorées, aucun fichier laissé ouvert"""
+    path = tmp_path / "dossiers.ndjson.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'id': 1, 'entreprise': 'Café Étoile'}, ensure_ascii=False) + "\n\n")
+        f.write(json.dumps({'id': 2}) + "\n")
+
+    assert detect_format(path) == 'ndjson'
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ResourceWarning)
+        records = list(iter_records(path))
+        gc.collect()
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+    assert records == [{'id': 1, 'entreprise': 'Café Étoile'}, {'id': 2}]
+
+
+def test_iter_records_corrupt_line(tmp_path):
+    """Une ligne illisible produit une RecordError numérotée et la lecture continue"""
+    path = tmp_path / "dossiers.ndjson.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('{"id": 1}\n{"id": 2, "entre\n{"id": 3}\n')
+
+    records = list(iter_records(path))
+
+    assert records[0] == {'id': 1} and records[2] == {'id': 3}
+    assert isinstance(records[1], RecordError)
+    assert str(records[1]).startswith("ligne 2 : ")
+
+
+def test_load_json_gzip(tmp_path):
+    """Un dossier JSON compressé est décompressé à la lecture"""
+    path = tmp_path / "dossier.json.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump({'id': 'A'}, f)
+    assert load_json(path) == {'id': 'A'}
+
+
+def test_iter_records_json_list(tmp_path):
+    """Un fichier JSON contenant une liste produit un dossier par élément"""
+    path = tmp_path / "dossiers.json"
+    path.write_text(json.dumps([{'id': 1}, {'id': 2}, {'id': 3}]), encoding='utf-8')
+    assert [chunk for chunk in iter_chunks(iter_records(path), 2)] == [[{'id': 1}, {'id': 2}], [{'id': 3}]]
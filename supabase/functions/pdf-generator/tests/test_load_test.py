@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Tests du banc de charge"""
+
+import load_test
+
+
+def test_run_cli_large_stderr(tmp_path, monkeypatch):
+    """Un fils écrivant plus qu'un tampon de tube sur stderr ne bloque pas le banc"""
+    script = tmp_path / "bavard.py"
+    script.write_text(
+        "import sys\n"
+        "sys.stderr.write('x' * (1 << 20))\n"
+        "print('{\"success\": false, \"error\": \"test\"}')\n",
+        encoding='utf-8',
+    )
+    monkeypatch.setattr(load_test, 'SCRIPT_PATH', str(script))
+
+    result = load_test._run_cli("entree.json", "sortie.pdf")
+
+    assert result['success'] is False
+    assert result['error'] == "test"
+    assert result['max_rss_kb'] > 0
+
+
+def test_percentile():
+    """Percentile par interpolation linéaire"""
+    assert load_test.percentile([], 50) is None
+    assert load_test.percentile([1, 2, 3, 4], 50) == 2.5
+    assert load_test.percentile([5], 99) == 5
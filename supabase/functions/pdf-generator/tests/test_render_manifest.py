@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Tests du manifeste des rapports et du planificateur de régénération"""
+
+import json
+
+import pytest
+
+import generate_mayfin_report
+from render_manifest import RenderManifest
+
+FULL = {name: 0.01 for name, _ in generate_mayfin_report.SECTIONS}
+PREVIEW = {'cover': 0.01, 'summary': 0.01}
+
+
+def _record(manifest, report_id, decision, sections=FULL, degradations=()):
+    data = {'id': report_id, 'score': 60, 'recommendation': {'decision': decision}}
+    manifest.record(data, {
+        'success': True,
+        'file': report_id,
+        'bytes': 1000,
+        'render': {'sections': sections, 'profile': 'full', 'degradations': list(degradations),
+                   'pages': 9, 'elapsed': 0.2},
+    })
+    return data
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = RenderManifest(str(tmp_path / "manifeste.sqlite"))
+    _record(manifest, str(tmp_path / "a.pdf"), 'DÉFAVORABLE')
+    _record(manifest, str(tmp_path / "b.pdf"), 'FAVORABLE')
+    _record(manifest, str(tmp_path / "c.pdf"), 'FAVORABLE', sections=PREVIEW)
+    _record(manifest, str(tmp_path / "d.pdf"), 'À ÉTUDIER', degradations=['images'])
+    _record(manifest, str(tmp_path / "e.pdf"), 'FAVORABLE')
+    # b est le plus récent des rendus favorables
+    manifest.conn.execute("UPDATE renders SET rendered_at = '2026-01-01T00:00:00'")
+    manifest.conn.execute("UPDATE renders SET rendered_at = '2026-02-01T00:00:00' WHERE report_id LIKE '%b.pdf'")
+    manifest.commit()
+    yield manifest
+    manifest.close()
+
+
+def _names(planned):
+    return [item['report_id'].rsplit('/', 1)[-1] for item in planned]
+
+
+def test_plan_empty_when_template_unchanged(manifest):
+    """Aucun rapport n'est planifié tant que le gabarit n'a pas changé"""
+    assert manifest.plan() == []
+
+
+def test_plan_selects_affected_sections(manifest, monkeypatch):
+    """Les mentions légales ne touchent que les rapports contenant l'annexe"""
+    monkeypatch.setattr(generate_mayfin_report, 'MENTIONS_LEGALES', "Nouvelles mentions.")
+    planned = manifest.plan()
+
+    assert _names(planned) == ['b.pdf', 'e.pdf', 'd.pdf', 'a.pdf']
+    assert all(item['reasons'] == ['mentions'] for item in planned)
+    assert all(item['has_input'] for item in planned)
+    assert _names(manifest.plan(limit=2)) == ['b.pdf', 'e.pdf']
+
+
+def test_plan_all_sections_for_colors(manifest, monkeypatch):
+    """Un changement de couleur touche aussi les aperçus"""
+    monkeypatch.setattr(generate_mayfin_report, 'MAYFIN_GREEN', generate_mayfin_report.colors.HexColor('#00A060'))
+    planned = manifest.plan()
+
+    assert _names(planned) == ['b.pdf', 'c.pdf', 'e.pdf', 'd.pdf', 'a.pdf']
+    assert planned[0]['reasons'] == ['colors']
+
+
+def test_plan_degraded(manifest):
+    """`include_degraded` ajoute les rendus en mode allégé"""
+    planned = manifest.plan(include_degraded=True)
+    assert _names(planned) == ['d.pdf']
+    assert planned[0]['reasons'] == ['degradations']
+
+
+def test_load_input_roundtrip(manifest, tmp_path):
+    """Le dossier source archivé est restitué à l'identique"""
+    data = manifest.load_input('file', str(tmp_path / "b.pdf"))
+    assert data == {'id': str(tmp_path / "b.pdf"), 'score': 60, 'recommendation': {'decision': 'FAVORABLE'}}
+
+
+def test_skip_current(tmp_path):
+    """Avec skip_current, un rapport à jour dans le manifeste n'est pas rendu à nouveau"""
+    input_path = tmp_path / "dossiers.ndjson"
+    sample = generate_mayfin_report.get_sample_data()
+    input_path.write_text(json.dumps(dict(sample, id='S1'), ensure_ascii=False) + "\n", encoding='utf-8')
+    output_dir = str(tmp_path / "out")
+
+    with RenderManifest(str(tmp_path / "manifeste.sqlite")) as manifest:
+        first = list(generate_mayfin_report.generate_reports_from_stream(
+            str(input_path), output_dir, workers=1, manifest=manifest, skip_current=True))
+        second = list(generate_mayfin_report.generate_reports_from_stream(
+            str(input_path), output_dir, workers=1, manifest=manifest, skip_current=True))
+
+    assert first[0]['success'] and not first[0].get('skipped')
+    assert second == [{'success': True, 'file': first[0]['file'], 'skipped': True}]
+
+
+def test_is_current_requires_full_render(tmp_path):
+    """Un rapport allégé ou limité à l'aperçu n'est pas à jour pour un rendu complet"""
+    complete_id, degraded_id, preview_id = (str(tmp_path / name) for name in ("c.pdf", "d.pdf", "p.pdf"))
+    with RenderManifest(str(tmp_path / "manifeste.sqlite")) as manifest:
+        complete = _record(manifest, complete_id, 'FAVORABLE')
+        degraded = _record(manifest, degraded_id, 'FAVORABLE', degradations=['images'])
+        preview = _record(manifest, preview_id, 'FAVORABLE', sections=PREVIEW)
+
+        assert manifest.is_current(complete, 'file', complete_id)
+        assert not manifest.is_current(degraded, 'file', degraded_id)
+        assert not manifest.is_current(preview, 'file', preview_id)
+        assert manifest.is_current(preview, 'file', preview_id, sections=('cover',))
+
+
+def test_skip_current_rerenders_degraded(tmp_path):
+    """Un rapport rendu en mode dégradé est rendu à nouveau malgré skip_current"""
+    input_path = tmp_path / "dossiers.ndjson"
+    sample = generate_mayfin_report.get_sample_data()
+    input_path.write_text(json.dumps(dict(sample, id='S1'), ensure_ascii=False) + "\n", encoding='utf-8')
+    output_dir = str(tmp_path / "out")
+
+    with RenderManifest(str(tmp_path / "manifeste.sqlite")) as manifest:
+        first = list(generate_mayfin_report.generate_reports_from_stream(
+            str(input_path), output_dir, workers=1, time_budget=0.0, manifest=manifest, skip_current=True))
+        second = list(generate_mayfin_report.generate_reports_from_stream(
+            str(input_path), output_dir, workers=1, manifest=manifest, skip_current=True))
+
+    assert first[0]['render']['degradations']
+    assert second[0]['success'] and not second[0].get('skipped')
+    assert second[0]['render']['degradations'] == []
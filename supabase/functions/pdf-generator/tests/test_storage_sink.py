@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Tests de l'envoi vers Supabase Storage, contre le serveur simulé"""
+
+import os
+
+import pytest
+
+from storage_sink import StorageSink, UploadError, _RetryableError
+from storage_standin import StandInStorage
+
+
+@pytest.fixture
+def storage():
+    with StandInStorage(fail_rate=0.0, seed=7) as storage:
+        yield storage
+
+
+def _sink(storage, **options):
+    options.setdefault('backoff', 0.001)
+    return StorageSink(base_url=storage.url, api_key='test', bucket='documents', **options)
+
+
+def test_upload_retries_transient_failures(storage):
+    """Les 503 sont relancés jusqu'au succès, sur des connexions réutilisées"""
+    storage.fail_rate = 0.4
+    payloads = {f"rapports/{i}.pdf": os.urandom(2000 + i) for i in range(10)}
+    with _sink(storage, max_retries=10, max_workers=2) as sink:
+        futures = [sink.submit(data, name) for name, data in payloads.items()]
+        results = [future.result() for future in futures]
+
+    assert all(result['success'] for result in results)
+    assert storage.failures > 0
+    assert len(storage.connections) <= 2
+    for name, data in payloads.items():
+        assert storage.objects[f"documents/{name}"] == data
+
+
+def test_upload_gives_up_after_max_retries(storage):
+    """Après max_retries, l'échec est définitif"""
+    storage.fail_rate = 1.0
+    with _sink(storage, max_retries=2) as sink:
+        with pytest.raises(UploadError):
+            sink.upload(b'%PDF', "rapports/echec.pdf")
+        result = sink.submit(b'%PDF', "rapports/echec.pdf").result()
+
+    assert result['success'] is False
+    assert storage.requests == 6
+
+
+def test_upload_conflict_is_not_retried(storage):
+    """Un refus non transitoire (409 sans upsert) n'est pas relancé"""
+    with _sink(storage, upsert=False) as sink:
+        sink.upload(b'v1', "rapports/a.pdf")
+        with pytest.raises(UploadError) as error:
+            sink.upload(b'v2', "rapports/a.pdf")
+
+    assert error.value.status == 409
+    assert storage.objects["documents/rapports/a.pdf"] == b'v1'
+
+
+def test_upload_lost_response_is_verified(storage):
+    """Sans upsert, le 409 d'une reprise après une réponse perdue est vérifié puis accepté"""
+    storage.lost_responses = 1
+    with _sink(storage, upsert=False) as sink:
+        result = sink.upload(b'%PDF-v1', "rapports/perdu.pdf")
+
+    assert result['success']
+    assert storage.requests == 2
+    assert storage.objects["documents/rapports/perdu.pdf"] == b'%PDF-v1'
+
+
+def test_upload_retry_conflict_with_other_object(storage, monkeypatch):
+    """Un 409 après reprise reste un conflit si l'objet présent n'est pas le nôtre"""
+    storage.objects["documents/rapports/b.pdf"] = b'ancien contenu'
+    with _sink(storage, upsert=False) as sink:
+        request = sink.pool.request
+        dropped = []
+
+        def drop_first_post(method, path, **options):
+            if method == 'POST' and not dropped:
+                dropped.append(path)
+                raise _RetryableError("connexion interrompue")
+            return request(method, path, **options)
+
+        monkeypatch.setattr(sink.pool, 'request', drop_first_post)
+        with pytest.raises(UploadError) as error:
+            sink.upload(b'v1', "rapports/b.pdf")
+
+    assert dropped and error.value.status == 409
+    assert storage.objects["documents/rapports/b.pdf"] == b'ancien contenu'
+
+
+def test_submit_reports_unexpected_errors(storage, monkeypatch):
+    """Une erreur inattendue pendant un envoi en arrière-plan donne un résultat en échec"""
+    with _sink(storage, max_workers=1, max_pending=1) as sink:
+        monkeypatch.setattr(sink, 'upload', lambda *args: 1 / 0)
+        first = sink.submit(b'%PDF', "rapports/a.pdf").result(timeout=5)
+        second = sink.submit(b'%PDF', "rapports/b.pdf").result(timeout=5)
+
+    assert first == {'success': False, 'bucket': 'documents', 'object': "rapports/a.pdf",
+                     'error': "division by zero"}
+    assert second['success'] is False
+
+
+def test_resumable_upload(storage):
+    """Au-delà du seuil, l'envoi passe par TUS en fragments, y compris avec des pannes"""
+    storage.fail_rate = 0.2
+    data = os.urandom(10000)
+    with _sink(storage, max_retries=10, multipart_threshold=4096, chunk_size=3000) as sink:
+        result = sink.upload(data, "rapports/gros.pdf")
+
+    assert result['success'] and result['bytes'] == len(data)
+    assert len(storage.uploads) == 1
+    assert storage.objects["documents/rapports/gros.pdf"] == data